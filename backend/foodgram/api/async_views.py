@@ -0,0 +1,62 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+from rest_framework.permissions import SAFE_METHODS
+
+# Имена маршрутов роутера, чтение по которым выполняется асинхронно.
+ASYNC_READ_ROUTES = (
+    'recipe-list',
+    'recipe-detail',
+    'tag-list',
+    'tag-detail',
+    'ingredient-list',
+    'ingredient-detail',
+    'user-subscriptions',
+)
+
+
+def run_read_view(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_read_view(view):
+    """
+    Оборачивает синхронное представление DRF в корутину.
+
+    Безопасные запросы выполняются в общем пуле потоков, поэтому один
+    ASGI-воркер обслуживает несколько запросов, ожидающих ответа БД.
+    Изменяющие запросы, как и раньше, выполняются в основном потоке.
+    """
+    run_read = sync_to_async(run_read_view, thread_sensitive=False)
+    run_write = sync_to_async(view)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await run_read(view, request, *args, **kwargs)
+        return await run_write(request, *args, **kwargs)
+
+    return wrapper
+
+
+def with_async_reads(urlpatterns, route_names=ASYNC_READ_ROUTES):
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_read_view(pattern.callback),
+            pattern.default_args,
+            pattern.name
+        )
+        if pattern.name in route_names else pattern
+        for pattern in urlpatterns
+    ]
@@ -0,0 +1,362 @@
+"""
+Выгрузка и загрузка рецептов со всеми связями в формате NDJSON.
+
+Каждая строка файла - объект с полем type. Разделы идут в порядке
+зависимостей, поэтому при загрузке строки читаются потоком: связи
+ссылаются только на уже загруженные записи. Исходные id заменяются на
+id в базе по естественным ключам: тег по названию, ингредиент по
+названию и единице измерения, пользователь по email, рецепт по автору
+и названию.
+
+С --with-media после рецептов выгружаются их картинки (тип image,
+содержимое в base64); при загрузке отсутствующие файлы сохраняются под
+исходными именами.
+"""
+import base64
+import gzip
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import groupby
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+import orjson
+
+from recipes.models import (
+    Favorite,
+    Follow,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+    Tag,
+    User
+)
+from recipes.storage import recipe_image_storage
+
+from .cache import bump_catalog_version
+from .catalog import build_catalog_snapshot
+
+EXPORT_CHUNK_SIZE = 2000
+# Типы записей в порядке выгрузки.
+RECORD_TYPES = (
+    'tag', 'ingredient', 'user', 'recipe', 'image', 'recipe_tag',
+    'recipe_ingredient', 'follow', 'favorite', 'shopping_list'
+)
+USER_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'password',
+    'is_staff', 'is_superuser', 'is_active', 'date_joined'
+)
+RECIPE_FIELDS = (
+    'id', 'author_id', 'name', 'image', 'text', 'cooking_time', 'pub_date'
+)
+# Поля с auto_now_add, которые при загрузке берутся из файла.
+DATE_FIELDS = (
+    (Recipe, 'pub_date'),
+    (Favorite, 'added_date'),
+    (ShoppingList, 'added_date'),
+)
+
+
+def open_backup(path, mode):
+    """Файл выгрузки, с .gz на конце - сжатый."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def get_export_sections():
+    users = User.objects.filter(is_deleted=False)
+    recipes = Recipe.objects.filter(author__is_deleted=False)
+    return (
+        ('tag', Tag.objects.all(), ('id', 'name', 'color', 'slug')),
+        (
+            'ingredient',
+            Ingredient.objects.all(),
+            ('id', 'name', 'measurement_unit')
+        ),
+        ('user', users, USER_FIELDS),
+        ('recipe', recipes, RECIPE_FIELDS),
+        (
+            'recipe_tag',
+            Recipe.tags.through.objects.filter(recipe__in=recipes),
+            ('recipe_id', 'tag_id')
+        ),
+        (
+            'recipe_ingredient',
+            RecipeIngredient.objects.filter(recipe__in=recipes),
+            ('recipe_id', 'ingredient_id', 'amount')
+        ),
+        (
+            'follow',
+            Follow.objects.filter(user__in=users, following__in=users),
+            ('user_id', 'following_id')
+        ),
+        (
+            'favorite',
+            Favorite.objects.filter(user__in=users, recipe__in=recipes),
+            ('user_id', 'recipe_id', 'added_date')
+        ),
+        (
+            'shopping_list',
+            ShoppingList.objects.filter(user__in=users, recipe__in=recipes),
+            ('user_id', 'recipe_id', 'added_date')
+        ),
+    )
+
+
+def export_recipes(stream, report, with_media=False):
+    """
+    Пишет разделы выгрузки в stream.
+
+    Строки читаются курсором на сервере порциями по EXPORT_CHUNK_SIZE,
+    поэтому расход памяти не зависит от размера базы.
+    """
+    for kind, queryset, fields in get_export_sections():
+        started = time.perf_counter()
+        count = 0
+        rows = queryset.order_by('pk').values_list(*fields).iterator(
+            chunk_size=EXPORT_CHUNK_SIZE
+        )
+        for row in rows:
+            record = {'type': kind, **dict(zip(fields, row))}
+            stream.write(orjson.dumps(record) + b'\n')
+            count += 1
+        report(kind, count, time.perf_counter() - started)
+
+        if kind == 'recipe' and with_media:
+            export_images(stream, queryset, report)
+
+
+def export_images(stream, recipes, report):
+    """Картинки рецептов, по одной на строку; отсутствующие пропускаются."""
+    started = time.perf_counter()
+    count = 0
+    names = recipes.order_by('image').values_list(
+        'image', flat=True
+    ).distinct().iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for name in names:
+        if not name or not recipe_image_storage.exists(name):
+            continue
+        with recipe_image_storage.open(name) as file:
+            content = base64.b64encode(file.read()).decode()
+        stream.write(
+            orjson.dumps({'type': 'image', 'name': name, 'content': content})
+            + b'\n'
+        )
+        count += 1
+    report('image', count, time.perf_counter() - started)
+
+
+@contextmanager
+def original_dates():
+    """Отключает auto_now_add, чтобы bulk_create сохранил даты из файла."""
+    fields = [model._meta.get_field(name) for model, name in DATE_FIELDS]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def lookup(model, key_fields, keys):
+    """id записей по естественным ключам."""
+    if not keys:
+        return {}
+    queryset = model.objects.filter(
+        **{f'{key_fields[0]}__in': {key[0] for key in keys}}
+    ).values_list(*key_fields, 'id')
+    return {tuple(row[:-1]): row[-1] for row in queryset if row[:-1] in keys}
+
+
+class RecipeImporter:
+    """Загружает строки выгрузки пачками через bulk_create."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.ids = defaultdict(dict)
+        # Рецепты, созданные этой загрузкой: только им добавляются теги
+        # и ингредиенты, уже существующие рецепты не меняются.
+        self.created_recipes = set()
+        self.created_catalog = False
+        self.skipped = 0
+
+    def load(self, kind, rows):
+        if kind not in RECORD_TYPES:
+            raise ValueError(f'Неизвестный тип записи: {kind}')
+        return getattr(self, f'load_{kind}')(rows)
+
+    def load_objects(self, kind, model, key_fields, objects):
+        """
+        Создаёт отсутствующие в базе объекты и запоминает их id.
+
+        objects - словарь {исходный id: несохранённый объект}. Возвращает
+        исходные id созданных объектов.
+        """
+        keys = {
+            source_id: tuple(getattr(obj, field) for field in key_fields)
+            for source_id, obj in objects.items()
+        }
+        found = lookup(model, key_fields, set(keys.values()))
+        new = {
+            source_id: obj for source_id, obj in objects.items()
+            if keys[source_id] not in found
+        }
+        # Дубликаты ключа внутри пачки создаются один раз.
+        unique = {keys[source_id]: obj for source_id, obj in new.items()}
+        model.objects.bulk_create(
+            unique.values(), batch_size=self.batch_size, ignore_conflicts=True
+        )
+        found.update(
+            lookup(model, key_fields, {keys[source_id] for source_id in new})
+        )
+
+        for source_id, key in keys.items():
+            if key in found:
+                self.ids[kind][source_id] = found[key]
+            else:
+                self.skipped += 1
+        return {source_id for source_id in new if keys[source_id] in found}
+
+    def load_links(self, model, rows, references, fields=()):
+        """Создаёт строки связей, для которых найдены все ссылки."""
+        objects = []
+        for row in rows:
+            values = {
+                field: self.ids[kind].get(row[field])
+                for field, kind in references.items()
+            }
+            if None in values.values():
+                self.skipped += 1
+                continue
+            values.update((field, row[field]) for field in fields)
+            objects.append(model(**values))
+        model.objects.bulk_create(
+            objects, batch_size=self.batch_size, ignore_conflicts=True
+        )
+
+    def load_tag(self, rows):
+        created = self.load_objects('tag', Tag, ('name',), {
+            row['id']: Tag(name=row['name'], color=row['color'],
+                           slug=row['slug'])
+            for row in rows
+        })
+        self.created_catalog |= bool(created)
+
+    def load_ingredient(self, rows):
+        created = self.load_objects(
+            'ingredient', Ingredient, ('name', 'measurement_unit'), {
+                row['id']: Ingredient(
+                    name=row['name'],
+                    measurement_unit=row['measurement_unit']
+                )
+                for row in rows
+            }
+        )
+        self.created_catalog |= bool(created)
+
+    def load_user(self, rows):
+        self.load_objects('user', User, ('email',), {
+            row['id']: User(
+                **{field: row[field] for field in USER_FIELDS[1:]}
+            )
+            for row in rows
+        })
+
+    def load_recipe(self, rows):
+        recipes = {}
+        for row in rows:
+            author_id = self.ids['user'].get(row['author_id'])
+            if author_id is None:
+                self.skipped += 1
+                continue
+            recipes[row['id']] = Recipe(
+                author_id=author_id,
+                **{field: row[field] for field in RECIPE_FIELDS[2:]}
+            )
+        self.created_recipes |= self.load_objects(
+            'recipe', Recipe, ('name', 'author_id'), recipes
+        )
+
+    def load_image(self, rows):
+        directory = Recipe._meta.get_field('image').upload_to
+        for row in rows:
+            if not row['name'].startswith(f'{directory}/'):
+                raise ValueError(f'Картинка вне {directory}: {row["name"]}')
+            recipe_image_storage.restore(
+                row['name'], ContentFile(base64.b64decode(row['content']))
+            )
+
+    def load_recipe_tag(self, rows):
+        self.load_links(
+            Recipe.tags.through,
+            [row for row in rows if row['recipe_id'] in self.created_recipes],
+            {'recipe_id': 'recipe', 'tag_id': 'tag'}
+        )
+
+    def load_recipe_ingredient(self, rows):
+        self.load_links(
+            RecipeIngredient,
+            [row for row in rows if row['recipe_id'] in self.created_recipes],
+            {'recipe_id': 'recipe', 'ingredient_id': 'ingredient'},
+            ('amount',)
+        )
+
+    def load_follow(self, rows):
+        self.load_links(
+            Follow, rows, {'user_id': 'user', 'following_id': 'user'}
+        )
+
+    def load_favorite(self, rows):
+        self.load_links(
+            Favorite, rows, {'user_id': 'user', 'recipe_id': 'recipe'},
+            ('added_date',)
+        )
+
+    def load_shopping_list(self, rows):
+        self.load_links(
+            ShoppingList, rows, {'user_id': 'user', 'recipe_id': 'recipe'},
+            ('added_date',)
+        )
+
+
+def read_batches(stream, batch_size):
+    """Подряд идущие строки одного типа пачками не больше batch_size."""
+    records = (orjson.loads(line) for line in stream if line.strip())
+    for kind, group in groupby(records, key=lambda record: record['type']):
+        batch = []
+        for record in group:
+            batch.append(record)
+            if len(batch) == batch_size:
+                yield kind, batch
+                batch = []
+        if batch:
+            yield kind, batch
+
+
+def import_recipes(stream, batch_size, report):
+    """
+    Загружает выгрузку одной транзакцией.
+
+    В памяти держатся только текущая пачка и соответствие исходных id
+    новым.
+    """
+    importer = RecipeImporter(batch_size)
+    totals = defaultdict(lambda: [0, 0.0])
+    with transaction.atomic(), original_dates():
+        for kind, rows in read_batches(stream, batch_size):
+            started = time.perf_counter()
+            importer.load(kind, rows)
+            totals[kind][0] += len(rows)
+            totals[kind][1] += time.perf_counter() - started
+
+    if importer.created_catalog:
+        bump_catalog_version()
+        build_catalog_snapshot()
+    for kind, (count, elapsed) in totals.items():
+        report(kind, count, elapsed)
+    return importer.skipped
@@ -0,0 +1,138 @@
+import hashlib
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.utils.connection import ConnectionProxy
+
+from rest_framework.permissions import SAFE_METHODS
+
+# Кеш, который сбрасывается сигналами; см. CACHES в настройках.
+cache = ConnectionProxy(caches, 'recipes')
+
+# Версия справочников: при изменении тега или ингредиента меняется ключ
+# всех закешированных рецептов, старые записи истекают сами.
+CATALOG_VERSION_KEY = 'recipe-catalog-version'
+RECIPE_CACHE_KEY = 'recipe:{version}:{recipe_id}'
+# Рецепты в избранном и списке покупок пользователя. Версия меняется при
+# каждой записи, поэтому набор, прочитанный до изменения, не попадёт
+# под новый ключ.
+MEMBERSHIP_VERSION_KEY = 'membership-version:{model}:{user_id}'
+MEMBERSHIP_CACHE_KEY = 'membership:{model}:{user_id}:{version}'
+RECIPE_FACETS_CACHE_KEY = 'recipe-facets:{digest}'
+
+
+def is_cache_shared():
+    """Кеш recipes общий для всех воркеров, а не отключён."""
+    return not isinstance(caches['recipes'], DummyCache)
+
+
+def use_recipe_cache(request):
+    """Кеш подходит для чтения полного представления рецепта."""
+    return (
+        request is not None
+        and request.method in SAFE_METHODS
+        and 'fields' not in request.query_params
+        and 'omit' not in request.query_params
+    )
+
+
+def get_catalog_version():
+    return cache.get_or_set(CATALOG_VERSION_KEY, lambda: uuid4().hex, None)
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_VERSION_KEY, uuid4().hex, None)
+
+
+def get_recipe_keys(recipe_ids):
+    version = get_catalog_version()
+    return {
+        recipe_id: RECIPE_CACHE_KEY.format(
+            version=version, recipe_id=recipe_id
+        )
+        for recipe_id in recipe_ids
+    }
+
+
+def get_recipe_fragments(recipes, build_fragments):
+    """
+    Общая для всех пользователей часть представления рецептов.
+
+    Недостающие в кеше рецепты передаются в build_fragments одним списком,
+    результат сохраняется в кеш.
+    """
+    keys = get_recipe_keys(recipe.id for recipe in recipes)
+    cached = cache.get_many(keys.values())
+    fragments = {
+        recipe_id: cached[key]
+        for recipe_id, key in keys.items() if key in cached
+    }
+
+    missing = [recipe for recipe in recipes if recipe.id not in fragments]
+    if missing:
+        built = dict(zip(
+            (recipe.id for recipe in missing), build_fragments(missing)
+        ))
+        cache.set_many(
+            {keys[recipe_id]: data for recipe_id, data in built.items()},
+            settings.RECIPE_CACHE_TIMEOUT
+        )
+        fragments.update(built)
+
+    return [fragments[recipe.id] for recipe in recipes]
+
+
+def invalidate_recipes(recipe_ids):
+    cache.delete_many(list(get_recipe_keys(recipe_ids).values()))
+
+
+def get_membership_version_key(model, user_id):
+    return MEMBERSHIP_VERSION_KEY.format(
+        model=model._meta.model_name, user_id=user_id
+    )
+
+
+def get_user_recipe_ids(model, user):
+    """Множество id рецептов пользователя в избранном или списке покупок."""
+    version = cache.get_or_set(
+        get_membership_version_key(model, user.pk),
+        lambda: uuid4().hex,
+        None
+    )
+    key = MEMBERSHIP_CACHE_KEY.format(
+        model=model._meta.model_name, user_id=user.pk, version=version
+    )
+    recipe_ids = cache.get(key)
+    if recipe_ids is None:
+        recipe_ids = frozenset(
+            model.objects.filter(user=user).values_list(
+                'recipe_id', flat=True
+            )
+        )
+        cache.set(key, recipe_ids, settings.MEMBERSHIP_CACHE_TIMEOUT)
+    return recipe_ids
+
+
+def invalidate_user_recipe_ids(model, user_id):
+    cache.set(get_membership_version_key(model, user_id), uuid4().hex, None)
+
+
+def get_recipe_facets(params, compute):
+    """
+    Счётчики ?facets= для параметров фильтра, общих для всех пользователей.
+
+    params - пары (параметр, значения); порядок значений не важен.
+    Счётчики не сбрасываются при изменениях и живут
+    RECIPE_FACETS_CACHE_TIMEOUT секунд.
+    """
+    normalized = repr(sorted(
+        (name, sorted(values)) for name, values in params
+    ))
+    key = RECIPE_FACETS_CACHE_KEY.format(
+        digest=hashlib.sha256(normalized.encode()).hexdigest()
+    )
+    return cache.get_or_set(
+        key, compute, settings.RECIPE_FACETS_CACHE_TIMEOUT
+    )
@@ -0,0 +1,149 @@
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS
+
+import orjson
+
+from recipes.models import Ingredient
+
+from .cache import cache, is_cache_shared
+from .serializers import IngredientSerializer
+
+CATALOG_DIR = 'catalog'
+CATALOG_CACHE_KEY = 'ingredient-catalog'
+# Версия и имя текущего снимка для воркеров без общего кеша.
+CURRENT_SNAPSHOT = f'{CATALOG_DIR}/current.json'
+# Сколько последних снимков хранить: клиент, получивший версию перед
+# обновлением, ещё успеет скачать свой файл.
+CATALOG_KEEP_SNAPSHOTS = 2
+SNAPSHOT_PATTERN = re.compile(r'^ingredients\.([0-9a-f]{16})\.json(\.gz)?$')
+TEMP_PREFIX = '.tmp-'
+# Временные файлы прерванных сборок удаляются через час.
+TEMP_FILE_MAX_AGE = 3600
+
+# Копия current.json в памяти процесса и inode с временем изменения файла,
+# из которого она прочитана.
+_local_snapshot = {}
+
+
+def get_catalog_snapshot():
+    """Версия и имя файла текущего снимка справочника ингредиентов."""
+    if not is_cache_shared():
+        return get_local_snapshot()
+
+    snapshot = cache.get(CATALOG_CACHE_KEY)
+    if snapshot is None:
+        snapshot = build_catalog_snapshot()
+    return snapshot
+
+
+def get_local_snapshot():
+    """
+    Снимок из current.json, который перечитывается, только если файл
+    заменила сборка в этом или другом процессе.
+    """
+    path = default_storage.path(CURRENT_SNAPSHOT)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return build_catalog_snapshot()
+
+    key = (stat.st_ino, stat.st_mtime_ns)
+    local = _local_snapshot.get('current')
+    if local is None or local[0] != key:
+        with open(path, 'rb') as file:
+            local = (key, orjson.loads(file.read()))
+        _local_snapshot['current'] = local
+    return local[1]
+
+
+def build_catalog_snapshot():
+    """
+    Сохраняет справочник ингредиентов в MEDIA_ROOT/catalog.
+
+    Имя файла содержит хеш содержимого, рядом лежит сжатая копия для
+    gzip_static в nginx. Файл не перезаписывается, если справочник
+    не изменился. Справочник читается из основной базы: сборка после
+    изменения не должна получить с реплики старые данные.
+    """
+    data = orjson.dumps(
+        IngredientSerializer(
+            Ingredient.objects.using(DEFAULT_DB_ALIAS).order_by('id'),
+            many=True
+        ).data
+    )
+    version = hashlib.sha256(data).hexdigest()[:16]
+    name = f'{CATALOG_DIR}/ingredients.{version}.json'
+
+    if not default_storage.exists(name):
+        save_snapshot_file(f'{name}.gz', gzip.compress(data, mtime=0))
+        save_snapshot_file(name, data)
+        delete_old_snapshots(version)
+
+    snapshot = {'version': version, 'name': name}
+    save_snapshot_file(CURRENT_SNAPSHOT, orjson.dumps(snapshot))
+    cache.set(CATALOG_CACHE_KEY, snapshot, None)
+    return snapshot
+
+
+def save_snapshot_file(name, data):
+    """
+    Пишет файл под временным именем и переименовывает: одновременные
+    сборки одной версии не оставляют копий под другими именами.
+    """
+    path = default_storage.path(name)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        dir=directory, prefix=TEMP_PREFIX, delete=False
+    ) as file:
+        file.write(data)
+    os.chmod(file.name, default_storage.file_permissions_mode or 0o644)
+    os.replace(file.name, path)
+
+
+def delete_old_snapshots(current_version):
+    """
+    Оставляет CATALOG_KEEP_SNAPSHOTS последних версий, текущую и
+    current.json, удаляет остальные файлы каталога, кроме свежих временных.
+    """
+    directory = default_storage.path(CATALOG_DIR)
+    files = os.listdir(directory)
+    modified = {}
+    for file in files:
+        match = SNAPSHOT_PATTERN.match(file)
+        if match and not match.group(2):
+            modified[match.group(1)] = os.path.getmtime(
+                os.path.join(directory, file)
+            )
+    keep = set(
+        sorted(modified, key=modified.get, reverse=True)[
+            :CATALOG_KEEP_SNAPSHOTS
+        ]
+    )
+    keep.add(current_version)
+
+    now = time.time()
+    for file in files:
+        path = os.path.join(directory, file)
+        match = SNAPSHOT_PATTERN.match(file)
+        if match:
+            stale = match.group(1) not in keep
+        elif file == os.path.basename(CURRENT_SNAPSHOT):
+            stale = False
+        elif file.startswith(TEMP_PREFIX):
+            stale = now - os.path.getmtime(path) > TEMP_FILE_MAX_AGE
+        else:
+            stale = True
+        if stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Удалён одновременной сборкой.
+                pass
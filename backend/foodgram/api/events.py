@@ -0,0 +1,301 @@
+import asyncio
+import logging
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import close_old_connections
+from django.utils.dateparse import parse_datetime
+
+import orjson
+from rest_framework.authtoken.models import Token
+
+from recipes.changes import get_committed_until, read_page
+from recipes.models import Follow, Recipe, User
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = '/api/recipes/events/'
+EVENTS_TICKET_SALT = 'recipes.events'
+# Сколько непрочитанных событий хранить для одного соединения.
+EVENTS_QUEUE_SIZE = 100
+# Сколько пропущенных рецептов отдавать при переподключении.
+EVENTS_REPLAY_LIMIT = 50
+# Сколько новых рецептов выбирать за один запрос опроса.
+EVENTS_PAGE_SIZE = 500
+RECIPE_FIELDS = ('id', 'name', 'author_id', 'pub_date')
+# Последнее сообщение потока, если опрос базы завершился ошибкой.
+STREAM_ERROR = (
+    b'event: error\ndata: '
+    + orjson.dumps({'detail': 'Поток событий прерван, переподключитесь.'})
+    + b'\n\n'
+)
+
+
+def run_query(func, *args):
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+def get_user_id(token_key):
+    token = Token.objects.select_related('user').filter(
+        key=token_key, user__is_active=True
+    ).first()
+    return token.user_id if token is not None else None
+
+
+def issue_ticket(user_id):
+    """Билет для подключения к потоку событий без токена в адресе."""
+    return signing.dumps(user_id, salt=EVENTS_TICKET_SALT)
+
+
+def load_ticket(ticket):
+    try:
+        return signing.loads(
+            ticket,
+            salt=EVENTS_TICKET_SALT,
+            max_age=settings.EVENTS_TICKET_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+
+
+def get_active_user_id(user_id):
+    return User.objects.filter(
+        id=user_id, is_active=True, is_deleted=False
+    ).values_list('id', flat=True).first()
+
+
+def get_new_recipes(position):
+    """
+    Рецепты, опубликованные после position, в порядке (pub_date, id).
+
+    Рецепты моложе RECIPE_CHANGES_LAG_SECONDS не выбираются: транзакция,
+    начатая раньше, ещё может зафиксировать рецепт с меньшим id или
+    более ранней датой, и он оказался бы позади позиции опроса.
+    """
+    return read_page(
+        Recipe.objects.only(*RECIPE_FIELDS), 'pub_date', position,
+        get_committed_until(), EVENTS_PAGE_SIZE
+    )
+
+
+def get_followers(author_ids, user_ids):
+    return list(
+        Follow.objects.filter(
+            following_id__in=author_ids, user_id__in=user_ids
+        ).values_list('following_id', 'user_id')
+    )
+
+
+def get_missed_recipes(user_id, position):
+    recipes, _, _ = read_page(
+        Recipe.objects.filter(
+            author__followers__user_id=user_id
+        ).only(*RECIPE_FIELDS),
+        'pub_date', position, get_committed_until(), EVENTS_REPLAY_LIMIT
+    )
+    return recipes
+
+
+def format_event(recipe):
+    """
+    Событие о рецепте. id события - позиция рецепта в порядке
+    (pub_date, id), с неё продолжается поток после переподключения.
+    """
+    event_id = f'{recipe.pub_date.isoformat()},{recipe.id}'.encode()
+    data = orjson.dumps({
+        'id': recipe.id,
+        'name': recipe.name,
+        'author': recipe.author_id,
+        'pub_date': recipe.pub_date,
+    })
+    return b'id: %s\nevent: recipe\ndata: %s\n\n' % (event_id, data)
+
+
+class RecipeEventBroker:
+    """
+    Раздаёт уведомления о новых рецептах открытым соединениям воркера.
+
+    Один фоновый опрос на воркер раз в EVENTS_POLL_SECONDS выбирает новые
+    рецепты и подписчиков их авторов среди подключённых пользователей, так
+    что число запросов к базе не зависит от числа соединений.
+    """
+
+    def __init__(self):
+        self.queues = {}
+        self.poller = None
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(EVENTS_QUEUE_SIZE)
+        self.queues.setdefault(user_id, set()).add(queue)
+        if self.poller is None or self.poller.done():
+            self.poller = asyncio.ensure_future(self.poll())
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.queues.get(user_id, set())
+        queues.discard(queue)
+        if not queues:
+            self.queues.pop(user_id, None)
+
+    async def poll(self):
+        position = (get_committed_until(), None)
+        try:
+            while self.queues:
+                await asyncio.sleep(settings.EVENTS_POLL_SECONDS)
+                has_more = True
+                while has_more and self.queues:
+                    recipes, position, has_more = await self.query(
+                        get_new_recipes, position
+                    )
+                    if recipes:
+                        self.publish(recipes, await self.query(
+                            get_followers,
+                            {recipe.author_id for recipe in recipes},
+                            list(self.queues)
+                        ))
+        except Exception:
+            logger.exception('Опрос новых рецептов для потока событий прерван')
+            self.close_streams()
+
+    def publish(self, recipes, followers):
+        followers_by_author = {}
+        for author_id, user_id in followers:
+            followers_by_author.setdefault(author_id, []).append(user_id)
+        for recipe in recipes:
+            event = format_event(recipe)
+            for user_id in followers_by_author.get(recipe.author_id, ()):
+                for queue in self.queues.get(user_id, ()):
+                    if not queue.full():
+                        queue.put_nowait(event)
+
+    def close_streams(self):
+        """Завершает все соединения сообщением об ошибке."""
+        for queues in self.queues.values():
+            for queue in queues:
+                while queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(STREAM_ERROR)
+
+    @staticmethod
+    async def query(func, *args):
+        return await sync_to_async(run_query)(func, *args)
+
+
+broker = RecipeEventBroker()
+
+
+async def authenticate(scope):
+    """Пользователь по заголовку Authorization или билету ?ticket=."""
+    authorization = dict(scope['headers']).get(
+        b'authorization', b''
+    ).decode()
+    if authorization.startswith('Token '):
+        return await RecipeEventBroker.query(
+            get_user_id, authorization[len('Token '):].strip()
+        )
+    query = parse_qs(scope.get('query_string', b'').decode())
+    user_id = load_ticket(query.get('ticket', [''])[0])
+    if user_id is None:
+        return None
+    return await RecipeEventBroker.query(get_active_user_id, user_id)
+
+
+def get_last_event_position(scope):
+    value = dict(scope['headers']).get(b'last-event-id', b'').decode()
+    moment, _, recipe_id = value.rpartition(',')
+    try:
+        moment = parse_datetime(moment)
+    except ValueError:
+        return None
+    if moment is None or not recipe_id.isdigit():
+        return None
+    return moment, int(recipe_id)
+
+
+async def send_error(send, status, detail):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': orjson.dumps({'detail': detail}),
+    })
+
+
+async def recipe_events(scope, receive, send):
+    """
+    Поток server-sent events о новых рецептах авторов из подписок.
+
+    Токен передаётся в заголовке Authorization. EventSource не умеет
+    задавать заголовки, поэтому браузер передаёт в параметре ?ticket=
+    билет из /api/recipes/events/ticket/: в отличие от токена он годится
+    только для потока событий и истекает через EVENTS_TICKET_MAX_AGE.
+    """
+    if scope['method'] != 'GET':
+        return await send_error(send, 405, 'Метод не разрешён.')
+
+    user_id = await authenticate(scope)
+    if not user_id:
+        return await send_error(
+            send, 401, 'Учетные данные не были предоставлены.'
+        )
+
+    queue = broker.subscribe(user_id)
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+    # Досланные рецепты могут повториться в потоке, клиент сверяет id.
+    last_position = get_last_event_position(scope)
+    if last_position is not None:
+        for recipe in await RecipeEventBroker.query(
+            get_missed_recipes, user_id, last_position
+        ):
+            queue.put_nowait(format_event(recipe))
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        while not disconnected.done():
+            next_event = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                (next_event, disconnected),
+                timeout=settings.EVENTS_HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_event in done:
+                body = next_event.result()
+            else:
+                next_event.cancel()
+                body = b': ping\n\n'
+            if disconnected.done():
+                break
+            closing = body is STREAM_ERROR
+            await send({
+                'type': 'http.response.body',
+                'body': body,
+                'more_body': not closing,
+            })
+            if closing:
+                break
+    finally:
+        disconnected.cancel()
+        broker.unsubscribe(user_id, queue)
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
@@ -0,0 +1,127 @@
+import asyncio
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from itertools import islice
+
+from django.db import connections
+
+PDF_FONT = 'DejaVu'
+PDF_TOP = 750
+PDF_BOTTOM = 50
+PDF_LINE_HEIGHT = 20
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset, chunk_size):
+    """
+    Строки выгрузки порциями по chunk_size.
+
+    Под ASGI тело StreamingHttpResponse читается внутри цикла событий,
+    где Django запрещает запросы к базе. В этом случае порции читаются
+    в отдельном потоке: все они идут через одно соединение, которое
+    закрывается по окончании выгрузки.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+
+    rows = queryset.iterator(chunk_size=chunk_size)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        try:
+            while True:
+                chunk = executor.submit(
+                    lambda: list(islice(rows, chunk_size))
+                ).result()
+                if not chunk:
+                    break
+                yield from chunk
+        finally:
+            executor.submit(rows.close)
+            executor.submit(connections.close_all)
+
+
+def format_item(item):
+    return f'{item["name"]} ({item["measurement_unit"]}) - {item["total"]}'
+
+
+def iter_csv(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Единица измерения', 'Количество'))
+    for item in items:
+        yield writer.writerow(
+            (item['name'], item['measurement_unit'], item['total'])
+        )
+
+
+def iter_txt(items):
+    yield 'Список покупок:\n'
+    for item in items:
+        yield format_item(item) + '\n'
+
+
+def iter_json(items):
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + json.dumps(
+            item, ensure_ascii=False, separators=(',', ':')
+        )
+        separator = ','
+    yield ']'
+
+
+def register_pdf_font():
+    """
+    Регистрирует шрифт для PDF.
+
+    reportlab загружается при первой выгрузке в PDF или при прогреве
+    перед запуском воркеров, см. foodgram/warmup.py.
+    """
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    if PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(PDF_FONT, 'DejaVuSans.ttf'))
+
+
+def build_pdf(items):
+    from reportlab.pdfgen import canvas
+
+    register_pdf_font()
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer)
+    p.setFont(PDF_FONT, 12)
+
+    p.drawString(100, PDF_TOP, 'Список покупок:')
+
+    y = PDF_TOP - 2 * PDF_LINE_HEIGHT - 10
+    for item in items:
+        if y < PDF_BOTTOM:
+            p.showPage()
+            p.setFont(PDF_FONT, 12)
+            y = PDF_TOP
+        p.drawString(100, y, format_item(item))
+        y -= PDF_LINE_HEIGHT
+
+    p.showPage()
+    p.save()
+
+    buffer.seek(0)
+    return buffer
+
+
+STREAM_EXPORTS = {
+    'csv': iter_csv,
+    'txt': iter_txt,
+    'json': iter_json,
+}
@@ -1,19 +1,91 @@
+from django.conf import settings
+from django.db.models import Count, F
+
 from django_filters import rest_framework as filters
 
 from recipes.models import Recipe, Tag
 
+ORDERING_CHOICES = (
+    ('popular', 'Популярные'),
+    ('trending', 'Набирающие популярность'),
+)
+
+USER_RECIPES_LOOKUPS = {
+    'is_favorited': 'favorites__user',
+    'is_in_shopping_cart': 'shoppinglist__user',
+}
+
+# Группировки для ?facets=: поля ответа и поля рецепта, по которым
+# считается число рецептов.
+FACETS = {
+    'tags': {'slug': 'tags__slug', 'name': 'tags__name'},
+    'author': {'id': 'author_id', 'username': 'author__username'},
+}
+
+
+def get_facet_counts(queryset, facet):
+    """Число рецептов queryset в каждой группе одним запросом."""
+    fields = FACETS[facet]
+    group_by = list(fields.values())
+    rows = queryset.prefetch_related(None).order_by().values(
+        *group_by
+    ).annotate(
+        count=Count('id')
+    ).order_by('-count', *group_by)[:settings.RECIPE_FACETS_LIMIT + 1]
+    # Рецепты без тегов попадают в группу с пустыми полями.
+    return [
+        {
+            **{name: row[field] for name, field in fields.items()},
+            'count': row['count'],
+        }
+        for row in rows if row[group_by[0]] is not None
+    ][:settings.RECIPE_FACETS_LIMIT]
+
 
 class RecipeFilter(filters.FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        method='filter_tags'
     )
-    is_favorited = filters.BooleanFilter(field_name='is_favorited')
+    is_favorited = filters.BooleanFilter(method='filter_user_recipes')
     is_in_shopping_cart = filters.BooleanFilter(
-        field_name='is_in_shopping_cart'
+        method='filter_user_recipes'
+    )
+    ordering = filters.ChoiceFilter(
+        choices=ORDERING_CHOICES,
+        method='filter_ordering'
     )
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags')
+
+    def filter_tags(self, queryset, name, value):
+        # Без параметра tags поле возвращает пустой queryset тегов.
+        if not value:
+            return queryset
+        # Полусоединение вместо JOIN по тегам: рецепт с несколькими
+        # выбранными тегами не размножается и не нужен DISTINCT.
+        return queryset.filter(
+            id__in=Recipe.tags.through.objects.filter(
+                tag__in=value
+            ).values('recipe_id')
+        )
+
+    def filter_user_recipes(self, queryset, name, value):
+        lookup = USER_RECIPES_LOOKUPS[name]
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none() if value else queryset
+        if value:
+            return queryset.filter(**{lookup: user})
+        return queryset.exclude(**{lookup: user})
+
+    def filter_ordering(self, queryset, name, value):
+        # Рецепты без рейтинга (например, загруженные importrecipes до
+        # запуска updaterankings) идут в конце, а не пропадают из выдачи.
+        return queryset.order_by(
+            F(f'ranking__{value}').desc(nulls_last=True), '-id'
+        )
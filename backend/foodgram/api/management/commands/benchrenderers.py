@@ -0,0 +1,71 @@
+import timeit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import MessagePackRenderer, ORJSONRenderer
+from api.views import RecipeViewSet
+
+RENDERERS = (
+    ('json (DRF)', JSONRenderer),
+    ('json (orjson)', ORJSONRenderer),
+    ('msgpack', MessagePackRenderer),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время рендеринга и размер страницы списка рецептов '
+        'для разных форматов ответа'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            help='Число рецептов на странице'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Сколько раз рендерить страницу'
+        )
+
+    def handle(self, *args, **options):
+        host = next(
+            (host for host in settings.ALLOWED_HOSTS if host != '*'),
+            'localhost'
+        )
+        request = APIRequestFactory().get(
+            '/api/recipes/', {'limit': options['limit']}, SERVER_NAME=host
+        )
+        response = RecipeViewSet.as_view({'get': 'list'})(request)
+        data = response.data
+        self.stdout.write(
+            f'Рецептов на странице: {len(data["results"])}, '
+            f'повторов: {options["repeat"]}'
+        )
+
+        results = {}
+        for name, renderer_class in RENDERERS:
+            renderer = renderer_class()
+            content = renderer.render(data, renderer.media_type, {})
+            seconds = timeit.timeit(
+                lambda: renderer.render(data, renderer.media_type, {}),
+                number=options['repeat']
+            )
+            results[name] = content
+            self.stdout.write(
+                f'{name:<15} {seconds / options["repeat"] * 1000:8.3f} мс '
+                f'{len(content):>10} байт'
+            )
+
+        if results['json (DRF)'] == results['json (orjson)']:
+            self.stdout.write(self.style.SUCCESS('JSON совпадает побайтно'))
+        else:
+            self.stdout.write(self.style.ERROR('JSON отличается'))
@@ -0,0 +1,74 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Выполняется в отдельном процессе, как при запуске воркера без preload.
+PROBE = '''
+import json
+import resource
+import sys
+import time
+
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+loaded = time.perf_counter()
+if {warmup}:
+    from foodgram.warmup import warmup
+    warmup()
+finished = time.perf_counter()
+print(json.dumps({{
+    'load': loaded - started,
+    'warmup': finished - loaded,
+    'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'modules': len(sys.modules),
+}}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет время запуска и память процесса приложения '
+        'без прогрева и с прогревом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Сколько раз запускать каждый вариант'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"вариант":<12}{"загрузка, с":>14}{"прогрев, с":>14}'
+            f'{"RSS, МБ":>10}{"модулей":>10}'
+        )
+        for name, warmup in (('ленивый', False), ('прогрев', True)):
+            runs = [self.probe(warmup) for _ in range(options['repeat'])]
+            median = {
+                key: statistics.median(run[key] for run in runs)
+                for key in runs[0]
+            }
+            self.stdout.write(
+                f'{name:<12}{median["load"]:>14.3f}'
+                f'{median["warmup"]:>14.3f}{median["rss"]:>10.1f}'
+                f'{median["modules"]:>10.0f}'
+            )
+
+    def probe(self, warmup):
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE.format(warmup=warmup)],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            check=True,
+            text=True
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.backup import export_recipes, open_backup
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, теги, ингредиенты, рецепты, подписки, '
+        'избранное и списки покупок в NDJSON. Файл с .gz на конце '
+        'сжимается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'filename',
+            type=str,
+            help='Путь до файла выгрузки, например backup.ndjson.gz'
+        )
+        parser.add_argument(
+            '--with-media',
+            action='store_true',
+            help='Добавить в выгрузку картинки рецептов'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        self.total = 0
+        with open_backup(options['filename'], 'wb') as stream:
+            export_recipes(stream, self.report, options['with_media'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено {self.total} строк за {elapsed:.1f} с, '
+            f'{self.total / elapsed:.0f} строк в секунду'
+        ))
+
+    def report(self, kind, count, elapsed):
+        self.total += count
+        self.stdout.write(
+            f'{kind}: {count} строк, {count / (elapsed or 1):.0f} строк/с'
+        )
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+import orjson
+
+from api.backup import import_recipes, open_backup
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку команды exportrecipes. Записи, которые уже '
+        'есть в базе, сопоставляются по естественным ключам и не '
+        'дублируются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'filename',
+            type=str,
+            help='Путь до файла выгрузки'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк создавать одним запросом'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        self.total = 0
+        try:
+            with open_backup(options['filename'], 'rb') as stream:
+                skipped = import_recipes(
+                    stream, options['batch_size'], self.report
+                )
+        except (ValueError, KeyError, orjson.JSONDecodeError) as exc:
+            raise CommandError(f'Некорректный файл выгрузки: {exc}')
+
+        elapsed = time.perf_counter() - started
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f'Пропущено строк без связанных записей: {skipped}'
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {self.total} строк за {elapsed:.1f} с, '
+            f'{self.total / elapsed:.0f} строк в секунду. Ленты, рейтинги '
+            f'и похожие рецепты обновят команды rebuildfeeds, '
+            f'updaterankings --full и buildsimilar.'
+        ))
+
+    def report(self, kind, count, elapsed):
+        self.total += count
+        self.stdout.write(
+            f'{kind}: {count} строк, {count / (elapsed or 1):.0f} строк/с'
+        )
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodgram.warmup import warmup
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает тяжёлые модули и маршруты до запуска воркеров, '
+        'см. gunicorn.conf.py.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        warmup()
+        self.stdout.write(self.style.SUCCESS(
+            f'Прогрев занял {time.perf_counter() - started:.2f} с'
+        ))
@@ -1,8 +1,11 @@
 import base64
 
 from django.core.files.base import ContentFile
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Manager, Prefetch, prefetch_related_objects
 
 from rest_framework import serializers, status
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.validators import UniqueTogetherValidator
 
 from recipes.models import (
@@ -16,8 +19,59 @@ from recipes.models import (
     User
 )
 
+from .cache import (
+    get_recipe_fragments,
+    get_user_recipe_ids,
+    use_recipe_cache
+)
+
+
+def parse_field_names(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def get_sparse_fieldset(request, field_names):
+    """Поля ответа с учётом параметров запроса ?fields= и ?omit=."""
+    fieldset = set(field_names)
+    if request is None or request.method not in SAFE_METHODS:
+        return fieldset
 
-class UserSerializer(serializers.ModelSerializer):
+    params = request.query_params
+    if 'fields' in params:
+        fieldset &= parse_field_names(params['fields'])
+    if 'omit' in params:
+        fieldset -= parse_field_names(params['omit'])
+    return fieldset
+
+
+class SparseFieldsetMixin:
+    """Оставляет в ответе только поля, запрошенные в ?fields= и ?omit=."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fieldset = get_sparse_fieldset(
+            self.context.get('request'), self.fields
+        )
+        for field_name in set(self.fields) - fieldset:
+            self.fields.pop(field_name)
+
+
+class UserListSerializer(serializers.ListSerializer):
+    """Подписки текущего пользователя на всю страницу одним запросом."""
+
+    def to_representation(self, data):
+        users = list(data.all() if isinstance(data, Manager) else data)
+        user = self.context['request'].user
+        if user.is_authenticated:
+            self.context['subscribed_ids'] = set(
+                Follow.objects.filter(
+                    user=user, following__in=users
+                ).values_list('following_id', flat=True)
+            )
+        return super().to_representation(users)
+
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -26,8 +80,12 @@ class UserSerializer(serializers.ModelSerializer):
             'email', 'id', 'username',
             'first_name', 'last_name', 'is_subscribed'
         )
+        list_serializer_class = UserListSerializer
 
     def get_is_subscribed(self, obj):
+        subscribed_ids = self.context.get('subscribed_ids')
+        if subscribed_ids is not None:
+            return obj.id in subscribed_ids
         current_user = self.context['request'].user
         return (
             current_user.is_authenticated
@@ -65,25 +123,163 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeListDetailSerializer(serializers.ModelSerializer):
-    is_favorited = serializers.BooleanField(read_only=True)
-    is_in_shopping_cart = serializers.BooleanField(read_only=True)
+class RecipeAuthorSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = User
+        fields = ('email', 'id', 'username', 'first_name', 'last_name')
+
+
+class RecipeFragmentSerializer(serializers.ModelSerializer):
+    """Общая для всех пользователей часть представления рецепта."""
+
     tags = TagSerializer(many=True)
-    author = UserSerializer(read_only=True)
+    author = RecipeAuthorSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = (
-            'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'id', 'tags', 'author', 'ingredients',
+            'name', 'image', 'text', 'cooking_time'
         )
 
     def get_ingredients(self, obj):
         return RecipeIngredientSerializer(
-            RecipeIngredient.objects.filter(recipe=obj).all(), many=True
+            obj.recipeingredient_set.all(), many=True
+        ).data
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, Manager) else data
+        return self.child.to_representation_many(list(iterable))
+
+
+class RecipeListDetailSerializer(
+    SparseFieldsetMixin, RecipeFragmentSerializer
+):
+    """
+    Рецепт для списка и карточки.
+
+    Общая часть берётся из кеша, поверх неё выставляются отметки
+    текущего пользователя: избранное, список покупок и подписка на автора.
+    """
+
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
+    author = UserSerializer(read_only=True)
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'id', 'tags', 'author', 'ingredients', 'is_favorited',
+            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+        )
+        list_serializer_class = RecipeListSerializer
+
+    def get_recipe_ids(self, model):
+        user = self.context['request'].user
+        if not user.is_authenticated:
+            return frozenset()
+        recipe_ids = self.context.setdefault('user_recipe_ids', {})
+        if model not in recipe_ids:
+            recipe_ids[model] = get_user_recipe_ids(model, user)
+        return recipe_ids[model]
+
+    def get_is_favorited(self, obj):
+        return obj.id in self.get_recipe_ids(Favorite)
+
+    def get_is_in_shopping_cart(self, obj):
+        return obj.id in self.get_recipe_ids(ShoppingList)
+
+    def to_representation(self, instance):
+        return self.to_representation_many([instance])[0]
+
+    def to_representation_many(self, recipes):
+        request = self.context.get('request')
+        if not use_recipe_cache(request):
+            if request is not None and 'author' in self.fields:
+                # Подписки на авторов всей страницы одним запросом, см.
+                # UserSerializer.get_is_subscribed.
+                self.context['subscribed_ids'] = (
+                    self.get_subscribed_author_ids(request.user, recipes)
+                )
+            representations = []
+            for recipe in recipes:
+                representations.append(super().to_representation(recipe))
+            return representations
+
+        fragments = get_recipe_fragments(recipes, self.build_fragments)
+        subscribed_ids = self.get_subscribed_author_ids(request.user, recipes)
+        return [
+            self.overlay(request, recipe, fragment, subscribed_ids)
+            for recipe, fragment in zip(recipes, fragments)
+        ]
+
+    @staticmethod
+    def build_fragments(recipes):
+        """
+        Фрагменты по основной базе: они живут в кеше до следующей правки,
+        а реплика может ещё не получить только что сохранённое изменение.
+        """
+        prefetches = (
+            Prefetch('tags', queryset=Tag.objects.using(DEFAULT_DB_ALIAS)),
+            Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.using(
+                    DEFAULT_DB_ALIAS
+                ).select_related('ingredient')
+            ),
+        )
+        fresh = Recipe.objects.using(DEFAULT_DB_ALIAS).select_related(
+            'author'
+        ).prefetch_related(*prefetches).in_bulk([
+            recipe.id for recipe in recipes
+            if recipe._state.db != DEFAULT_DB_ALIAS
+        ])
+        # Прочитанные из основной базы и уже удалённые рецепты
+        # собираются как есть.
+        rest = [recipe for recipe in recipes if recipe.id not in fresh]
+        prefetch_related_objects(rest, 'author', *prefetches)
+        return RecipeFragmentSerializer(
+            [fresh.get(recipe.id, recipe) for recipe in recipes], many=True
         ).data
 
+    @staticmethod
+    def get_subscribed_author_ids(user, recipes):
+        if not user.is_authenticated:
+            return set()
+        return set(
+            Follow.objects.filter(
+                user=user,
+                following_id__in={recipe.author_id for recipe in recipes}
+            ).values_list('following_id', flat=True)
+        )
+
+    def overlay(self, request, recipe, fragment, subscribed_ids):
+        flags = {
+            'is_favorited': self.get_is_favorited(recipe),
+            'is_in_shopping_cart': self.get_is_in_shopping_cart(recipe),
+        }
+        representation = {
+            field_name: (
+                flags[field_name] if field_name in flags
+                else fragment[field_name]
+            )
+            for field_name in self.fields
+        }
+        representation['author'] = {
+            **fragment['author'],
+            'is_subscribed': recipe.author_id in subscribed_ids
+        }
+        if representation['image']:
+            representation['image'] = request.build_absolute_uri(
+                representation['image']
+            )
+        return representation
+
 
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
@@ -198,7 +394,9 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         representation['ingredients'] = RecipeIngredientSerializer(
-            RecipeIngredient.objects.filter(recipe=instance).all(),
+            RecipeIngredient.objects.filter(recipe=instance).select_related(
+                'ingredient'
+            ),
             many=True
         ).data
         representation['tags'] = TagSerializer(
@@ -208,6 +406,13 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         return representation
 
 
+def get_recipes_limit(request):
+    recipes_limit = request.GET.get('recipes_limit', None)
+    if recipes_limit is not None and recipes_limit.isdigit():
+        return int(recipes_limit)
+    return None
+
+
 class RecipeMiniSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения рецептов в списке подписок пользователя."""
 
@@ -216,7 +421,7 @@ class RecipeMiniSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     email = serializers.ReadOnlyField(source='following.email')
     id = serializers.ReadOnlyField(source='following.id')
     username = serializers.ReadOnlyField(source='following.username')
@@ -252,21 +457,21 @@ class FollowSerializer(serializers.ModelSerializer):
         return data
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        following_user = obj.following
-        return Follow.objects.filter(
-            user=user, following=following_user
-        ).exists()
+        return obj.user_id == self.context['request'].user.id
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit', None)
-        recipes = Recipe.objects.filter(author=obj.following)
-        if recipes_limit is not None and recipes_limit.isdigit():
-            recipes = recipes[:int(recipes_limit)]
+        # Список подписок заранее загружает рецепты всей страницы.
+        recipes = getattr(obj.following, 'subscription_recipes', None)
+        if recipes is None:
+            recipes = Recipe.objects.filter(author=obj.following)
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
         return RecipeMiniSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.following.recipes.count()
 
 
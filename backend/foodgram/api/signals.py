@@ -0,0 +1,125 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+    Tag,
+    User
+)
+from recipes.signals import recipes_marked_deleted
+
+from .cache import (
+    bump_catalog_version,
+    invalidate_recipes,
+    invalidate_user_recipe_ids
+)
+from .catalog import build_catalog_snapshot
+
+# Поля пользователя, которые входят в закешированное представление рецепта.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+# Атрибут соединения с метками on_commit_once.
+ON_COMMIT_ONCE_TOKENS = 'foodgram_on_commit_once'
+
+
+def on_commit_once(func):
+    """
+    Выполняет func после фиксации транзакции один раз на транзакцию.
+
+    Каждый вызов регистрирует свой обработчик, но func запускает только
+    первый из них: он забирает метку, общую для транзакции. Если
+    транзакция откатилась, метка остаётся и достаётся следующей.
+    """
+    connection = transaction.get_connection()
+    tokens = getattr(connection, ON_COMMIT_ONCE_TOKENS, None)
+    if tokens is None:
+        tokens = {}
+        setattr(connection, ON_COMMIT_ONCE_TOKENS, tokens)
+    token = tokens.setdefault(func, object())
+
+    def run():
+        if tokens.get(func) is token:
+            del tokens[func]
+            func()
+
+    transaction.on_commit(run)
+
+
+def invalidate_on_commit(recipe_ids):
+    transaction.on_commit(partial(invalidate_recipes, list(recipe_ids)))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_on_commit([instance.pk])
+
+
+@receiver(recipes_marked_deleted)
+def invalidate_deleted_recipes(sender, recipe_ids, **kwargs):
+    invalidate_on_commit(recipe_ids)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_recipe_ingredients(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_on_commit([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_relations(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_on_commit([instance.pk])
+    elif pk_set:
+        invalidate_on_commit(pk_set)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipes(sender, instance, created, raw, update_fields,
+                              **kwargs):
+    if created or raw:
+        return
+    if update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        return
+    invalidate_on_commit(
+        instance.recipes.values_list('id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalog(sender, raw=False, **kwargs):
+    if not raw:
+        on_commit_once(bump_catalog_version)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def rebuild_ingredient_catalog(sender, raw=False, **kwargs):
+    if not raw:
+        on_commit_once(build_catalog_snapshot)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+def invalidate_user_recipes(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(
+            partial(invalidate_user_recipe_ids, sender, instance.user_id)
+        )
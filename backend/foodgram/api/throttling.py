@@ -0,0 +1,70 @@
+from rest_framework.throttling import ScopedRateThrottle
+
+
+class ActionRateThrottle(ScopedRateThrottle):
+    """
+    Ограничение частоты запросов к отдельным действиям вьюсета.
+
+    Область ограничения берётся из словаря throttle_scopes вьюсета по имени
+    действия. Запросы считаются по скользящему окну: счётчики текущего и
+    предыдущего интервала лежат в общем кеше и увеличиваются атомарно,
+    поэтому лимит соблюдается при любом числе воркеров. Отклонённые
+    запросы не учитываются.
+    """
+
+    scope_attr = 'throttle_scopes'
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, {}).get(
+            getattr(view, 'action', None)
+        )
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        key = self.get_cache_key(request, view)
+        self.now = self.timer()
+        self.window = int(self.now // self.duration)
+
+        current_key = f'{key}_{self.window}'
+        self.current = self.increment(current_key)
+        self.previous = self.cache.get(f'{key}_{self.window - 1}', 0)
+        if self.get_estimate(self.current) <= self.num_requests:
+            return True
+
+        # Запрос отклонён: счётчик возвращается, чтобы повторные попытки
+        # не отодвигали момент, когда запросы снова будут приняты.
+        self.cache.decr(current_key)
+        self.current -= 1
+        return False
+
+    def increment(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            if self.cache.add(key, 1, self.duration * 2):
+                return 1
+            return self.cache.incr(key)
+
+    def get_window_fraction(self):
+        return self.now / self.duration - self.window
+
+    def get_estimate(self, current):
+        return self.previous * (1 - self.get_window_fraction()) + current
+
+    def wait(self):
+        fraction = self.get_window_fraction()
+        free = self.num_requests - self.current - 1
+        if free >= 0 and self.previous:
+            # Достаточно, чтобы вес предыдущего интервала уменьшился.
+            return max(1 - free / self.previous - fraction, 0) * self.duration
+
+        # Ждём следующий интервал, в котором текущий счётчик станет
+        # предыдущим и его вес уменьшится достаточно для ещё одного запроса.
+        # Счётчик не больше лимита, поэтому это дольше окна, только если
+        # лимит выбран в первой 1/num_requests доле окна. Тогда клиенту
+        # предлагается подождать окно: следующий отказ даст ожидание не
+        # дольше duration / num_requests.
+        next_fraction = max(1 - (self.num_requests - 1) / self.current, 0)
+        return min(1 - fraction + next_fraction, 1) * self.duration
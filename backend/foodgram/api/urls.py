@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.urls import include, path
 
 from rest_framework.routers import DefaultRouter
 
+from .async_views import with_async_reads
 from .views import (
     CustomUserViewSet,
     IngredientViewSet,
@@ -15,8 +17,12 @@ router.register('ingredients', IngredientViewSet)
 router.register('recipes', RecipeViewSet, basename='recipe')
 router.register('users', CustomUserViewSet)
 
+router_urls = router.urls
+if settings.ASYNC_READ_VIEWS:
+    router_urls = with_async_reads(router_urls)
+
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(router_urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken'))
 ]
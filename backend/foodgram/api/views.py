@@ -1,12 +1,20 @@
-from django.db.models import Sum
-from django.http import FileResponse
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import (
+    Count,
+    OuterRef,
+    Prefetch,
+    Q,
+    Subquery,
+    Sum,
+    prefetch_related_objects
+)
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
@@ -18,13 +26,33 @@ from recipes.models import (
     Follow,
     Ingredient,
     Recipe,
+    RecipeIngredient,
     ShoppingList,
     Tag,
     User
 )
-
-from .filters import RecipeFilter
+from recipes.changes import CursorError, CursorExpired, get_changes
+from recipes.deletion import mark_recipes_deleted, mark_users_deleted
+from recipes.feed import get_feed_queryset
+
+from .cache import get_recipe_facets, use_recipe_cache
+from .catalog import get_catalog_snapshot
+from .events import issue_ticket
+from .exports import STREAM_EXPORTS, build_pdf, iter_rows
+from .filters import (
+    FACETS,
+    USER_RECIPES_LOOKUPS,
+    RecipeFilter,
+    get_facet_counts
+)
+from .pagination import FeedPagination
 from .permissions import IsOwnerOrReadOnly
+from .renderers import (
+    CSVRenderer,
+    ORJSONRenderer,
+    PDFRenderer,
+    PlainTextRenderer
+)
 from .serializers import (
     FavoriteSerializer,
     FollowSerializer,
@@ -32,11 +60,35 @@ from .serializers import (
     RecipeCreateUpdateSerializer,
     RecipeListDetailSerializer,
     ShoppingListSerializer,
-    TagSerializer
+    TagSerializer,
+    get_recipes_limit,
+    get_sparse_fieldset,
+    parse_field_names
 )
 
+SHOPPING_LIST_CHUNK_SIZE = 2000
+
+
+def parse_recipe_ids(value):
+    """Список id из параметра ?ids=1,2,3 с сохранением порядка."""
+    try:
+        recipe_ids = [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        recipe_ids = None
+    if not recipe_ids:
+        raise ValidationError({'ids': ['Укажите id рецептов через запятую.']})
+    if len(recipe_ids) > settings.RECIPE_BATCH_MAX_IDS:
+        raise ValidationError({'ids': [
+            f'Не больше {settings.RECIPE_BATCH_MAX_IDS} рецептов за запрос.'
+        ]})
+    return recipe_ids
+
 
 class CustomUserViewSet(UserViewSet):
+    throttle_scopes = {
+        'list': 'user_list',
+        'subscribe': 'subscribe',
+    }
 
     @action(
         methods=["get"],
@@ -47,14 +99,40 @@ class CustomUserViewSet(UserViewSet):
         self.get_object = self.get_instance
         return self.retrieve(request, *args, **kwargs)
 
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+    def perform_destroy(self, instance):
+        mark_users_deleted(User.objects.filter(pk=instance.pk))
+
     @action(
         detail=False,
         permission_classes=(IsAuthenticated,)
     )
     def subscriptions(self, request):
         user = self.request.user
-        following = Follow.objects.filter(user=user)
+        following = Follow.objects.filter(
+            user=user, following__is_deleted=False
+        ).select_related('following').annotate(
+            recipes_count=Count(
+                'following__recipes',
+                filter=Q(following__recipes__is_deleted=False)
+            )
+        )
         pages = self.paginate_queryset(following)
+        recipes = Recipe.objects.all()
+        recipes_limit = get_recipes_limit(request)
+        if recipes_limit is not None:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('id')[:recipes_limit]
+            ))
+        prefetch_related_objects(pages, Prefetch(
+            'following__recipes',
+            queryset=recipes,
+            to_attr='subscription_recipes'
+        ))
         serializer = FollowSerializer(
             pages,
             many=True,
@@ -69,7 +147,9 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscribe(self, request, *args, **kwargs):
         user = self.request.user
-        author = get_object_or_404(User, id=self.kwargs.get('id'))
+        author = get_object_or_404(
+            User, id=self.kwargs.get('id'), is_deleted=False
+        )
         serializer = FollowSerializer(
             data=request.data,
             context={'request': request, 'author': author}
@@ -81,7 +161,9 @@ class CustomUserViewSet(UserViewSet):
     @subscribe.mapping.delete
     def delete_subscribe(self, request, *args, **kwargs):
         user = self.request.user
-        author = get_object_or_404(User, id=self.kwargs.get('id'))
+        author = get_object_or_404(
+            User, id=self.kwargs.get('id'), is_deleted=False
+        )
 
         if follow := user.following.filter(following=author).first():
             follow.delete()
@@ -107,20 +189,57 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ('^name',)
     pagination_class = None
 
+    @action(detail=False)
+    def version(self, request):
+        """Версия снимка справочника и адрес файла, который отдаёт nginx."""
+        snapshot = get_catalog_snapshot()
+        return Response({
+            'version': snapshot['version'],
+            'url': request.build_absolute_uri(
+                default_storage.url(snapshot['name'])
+            ),
+        })
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = (IsOwnerOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    throttle_scopes = {
+        'create': 'create',
+        'favorite': 'favorite',
+        'shopping_cart': 'favorite',
+        'download_shopping_cart': 'download_shopping_cart',
+    }
 
     def get_queryset(self):
-        user = self.request.user
+        queryset = Recipe.objects.all()
+        if use_recipe_cache(self.request):
+            # Автор, теги и ингредиенты загружаются сериализатором только
+            # для рецептов, которых нет в кеше.
+            return queryset
+
+        fieldset = get_sparse_fieldset(
+            self.request, RecipeListDetailSerializer.Meta.fields
+        )
 
-        return Recipe.objects.all().select_related(
-            'author'
-        ).prefetch_related(
-            'tags', 'ingredients'
-        ).with_favorite_shopping_info(user)
+        if 'author' in fieldset:
+            queryset = queryset.select_related('author')
+        if 'tags' in fieldset:
+            queryset = queryset.prefetch_related('tags')
+        if 'ingredients' in fieldset:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'recipeingredient_set',
+                    queryset=RecipeIngredient.objects.select_related(
+                        'ingredient'
+                    )
+                )
+            )
+        if 'text' not in fieldset:
+            queryset = queryset.defer('text')
+
+        return queryset
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
@@ -130,6 +249,103 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        facets = parse_field_names(request.query_params.get('facets', ''))
+        if facets - FACETS.keys():
+            raise ValidationError({'facets': [
+                f'Доступные фасеты: {", ".join(FACETS)}.'
+            ]})
+
+        response = super().list(request, *args, **kwargs)
+        if facets:
+            response.data['facets'] = self.get_facets(sorted(facets))
+        return response
+
+    def get_facets(self, facets):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        def compute():
+            return {
+                facet: get_facet_counts(queryset, facet) for facet in facets
+            }
+
+        params = self.request.query_params
+        if USER_RECIPES_LOOKUPS.keys() & params.keys():
+            return compute()
+        return get_recipe_facets(
+            [
+                (name, params.getlist(name))
+                for name in RecipeFilter.base_filters if name in params
+            ] + [('facets', facets)],
+            compute
+        )
+
+    def perform_destroy(self, instance):
+        mark_recipes_deleted(Recipe.objects.filter(pk=instance.pk))
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination
+    )
+    def feed(self, request):
+        queryset = get_feed_queryset(request.user, self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=['post'],
+        detail=False,
+        url_path='events/ticket',
+        permission_classes=(IsAuthenticated,)
+    )
+    def events_ticket(self, request):
+        """Билет для подключения EventSource к /api/recipes/events/."""
+        return Response({'ticket': issue_ticket(request.user.id)})
+
+    @action(detail=False)
+    def changes(self, request):
+        """Рецепты, изменённые и удалённые после токена ?since=."""
+        try:
+            # Из основной базы: реплика может отставать сильнее, чем
+            # RECIPE_CHANGES_LAG_SECONDS, и изменения были бы пропущены.
+            changes = get_changes(
+                self.get_queryset().using(DEFAULT_DB_ALIAS),
+                request.query_params.get('since')
+            )
+        except CursorExpired as exc:
+            return Response(
+                {'detail': str(exc)}, status=status.HTTP_410_GONE
+            )
+        except CursorError as exc:
+            raise ValidationError({'since': [str(exc)]})
+
+        changes['recipes'] = self.get_serializer(
+            changes['recipes'], many=True
+        ).data
+        return Response(changes)
+
+    @action(detail=False)
+    def batch(self, request):
+        """Рецепты по ?ids= в заданном порядке, null для ненайденных."""
+        recipe_ids = parse_recipe_ids(request.query_params.get('ids', ''))
+        recipes = list(self.get_queryset().filter(id__in=recipe_ids))
+        data = dict(zip(
+            (recipe.id for recipe in recipes),
+            self.get_serializer(recipes, many=True).data
+        ))
+        return Response([data.get(recipe_id) for recipe_id in recipe_ids])
+
+    @action(detail=True)
+    def similar(self, request, pk=None):
+        recipe = get_object_or_404(Recipe, id=pk)
+        queryset = self.get_queryset().filter(
+            similar_to__recipe=recipe
+        ).order_by('-similar_to__score')
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
     def post_favorite_shopping_cart(self, request, serializer_class):
         user = self.request.user
         recipe_id = self.kwargs.get('pk')
@@ -201,44 +417,40 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
         total_ingredients = ingredients.annotate(
             total=Sum('recipeingredient__amount')
-        ).values('name', 'measurement_unit', 'total')
+        ).values('name', 'measurement_unit', 'total').order_by('name')
 
         return total_ingredients
 
-    def generate_pdf_file(self):
-        from io import BytesIO
-
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer)
-
-        pdfmetrics.registerFont(TTFont('DejaVu', 'DejaVuSans.ttf'))
-        p.setFont('DejaVu', 12)
-
-        p.drawString(100, 750, 'Список покупок:')
-
-        total_ingredients = self.get_ingredients_list()
-        y = 700
-        for item in total_ingredients:
-            p.drawString(
-                100, y,
-                f'{item["name"]} ({item["measurement_unit"]}) - '
-                f'{item["total"]}'
-            )
-            y -= 20
-
-        p.showPage()
-        p.save()
-
-        buffer.seek(0)
-        return buffer
-
     @action(
         methods=['get'],
         detail=False,
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            PDFRenderer, CSVRenderer, PlainTextRenderer, ORJSONRenderer
+        )
     )
     def download_shopping_cart(self, request):
-        filename = 'shopping_cart.pdf'
-        buffer = self.generate_pdf_file()
-        response = FileResponse(buffer, as_attachment=True, filename=filename)
+        renderer = request.accepted_renderer
+        filename = f'shopping_cart.{renderer.format}'
+        ingredients = iter_rows(
+            self.get_ingredients_list(), SHOPPING_LIST_CHUNK_SIZE
+        )
+
+        if renderer.format == 'pdf':
+            return FileResponse(
+                build_pdf(ingredients), as_attachment=True, filename=filename
+            )
+
+        response = StreamingHttpResponse(
+            STREAM_EXPORTS[renderer.format](ingredients),
+            content_type=f'{renderer.media_type}; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
+
+    def handle_exception(self, exc):
+        if self.action == 'download_shopping_cart':
+            # Ошибки выгрузки отдаются в JSON при любом формате файла.
+            self.request.accepted_renderer = ORJSONRenderer()
+            self.request.accepted_media_type = ORJSONRenderer.media_type
+        return super().handle_exception(exc)
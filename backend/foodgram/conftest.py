@@ -0,0 +1 @@
+pytest_plugins = ['foodgram.pytest_plugin']
@@ -9,8 +9,24 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
+from asgiref.sync import ThreadSensitiveContext
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('ASYNC_READ_VIEWS', 'true')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api.events import EVENTS_PATH, recipe_events  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # Поток событий обслуживается без Django: соединение живёт долго и
+    # не должно занимать поток из пула.
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        return await recipe_events(scope, receive, send)
+    # Django 3.2 выполняет синхронные middleware (и синхронные части
+    # обработчика) в одном общем потоке на процесс. Свой контекст даёт
+    # каждому запросу отдельный поток, и запросы не ждут друг друга.
+    async with ThreadSensitiveContext():
+        return await django_application(scope, receive, send)
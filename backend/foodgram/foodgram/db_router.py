@@ -0,0 +1,142 @@
+import hashlib
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from rest_framework.permissions import SAFE_METHODS
+
+# Приложения, чтение из которых всегда идёт в основную базу: только что
+# выданный токен или сессия могут ещё не дойти до реплики.
+PRIMARY_ONLY_APPS = ('authtoken', 'sessions')
+
+PIN_CACHE_KEY = 'db-primary-pin:{}'
+
+_replica_alias = ContextVar('replica_alias', default=None)
+_unhealthy_until = {}
+
+
+def get_replica_aliases():
+    return [
+        alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS
+    ]
+
+
+def is_replica_healthy(alias):
+    if _unhealthy_until.get(alias, 0) > time.monotonic():
+        return False
+
+    connection = connections[alias]
+    try:
+        if (
+            settings.DB_REPLICA_HEALTH_CHECKS
+            and connection.connection is not None
+            and not connection.is_usable()
+        ):
+            connection.close()
+        connection.ensure_connection()
+    except DatabaseError:
+        connection.close()
+        _unhealthy_until[alias] = (
+            time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+        )
+        return False
+
+    _unhealthy_until.pop(alias, None)
+    return True
+
+
+def choose_replica():
+    aliases = get_replica_aliases()
+    random.shuffle(aliases)
+    for alias in aliases:
+        if is_replica_healthy(alias):
+            return alias
+    return None
+
+
+def in_transaction():
+    """Реплика не видит незафиксированных изменений открытой транзакции."""
+    return connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+def get_pin_key(request):
+    credentials = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    digest = hashlib.sha256(credentials.encode()).hexdigest()
+    return PIN_CACHE_KEY.format(digest)
+
+
+class ReplicaRouter:
+    """
+    Направляет чтение в реплику, выбранную для текущего запроса.
+
+    Реплика выбирается в ReplicaRoutingMiddleware, запись, миграции и
+    чтение внутри transaction.atomic всегда выполняются в основной базе.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS or in_transaction():
+            return DEFAULT_DB_ALIAS
+        return _replica_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Отправляет безопасные запросы к API на реплику.
+
+    После успешного изменяющего запроса клиент на
+    DB_REPLICA_PIN_SECONDS секунд закрепляется за основной базой,
+    чтобы сразу видеть свои изменения.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pin_key = get_pin_key(request)
+        token = None
+        if self.can_use_replica(request, pin_key):
+            alias = choose_replica()
+            if alias is not None:
+                token = _replica_alias.set(alias)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                _replica_alias.reset(token)
+
+        if (
+            pin_key is not None
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+        ):
+            cache.set(pin_key, True, settings.DB_REPLICA_PIN_SECONDS)
+
+        return response
+
+    def can_use_replica(self, request, pin_key):
+        return (
+            request.method in SAFE_METHODS
+            and request.path.startswith('/api/')
+            and len(settings.DATABASES) > 1
+            and not in_transaction()
+            and not (pin_key is not None and cache.get(pin_key))
+        )
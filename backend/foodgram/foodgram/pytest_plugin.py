@@ -0,0 +1,66 @@
+"""
+Плагин pytest для поиска N+1 запросов, см. foodgram/querycount.py.
+
+Подключается в conftest.py в корне проекта:
+
+    pytest_plugins = ['foodgram.pytest_plugin']
+
+Тестовые настройки (tests/settings.py) включают QueryCountMiddleware с
+QUERY_BUDGET_RAISE, поэтому при превышении бюджета маршрута запрос
+тестового клиента завершается исключением QueryBudgetExceeded.
+Бюджет отдельного теста задаётся маркером или фикстурой:
+
+    @pytest.mark.query_budget(10)
+    def test_recipes(client):
+        client.get('/api/recipes/')
+
+    def test_subscriptions(client, query_budget):
+        with query_budget(8):
+            client.get('/api/users/subscriptions/')
+"""
+from contextlib import contextmanager
+from functools import partial
+
+import pytest
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'query_budget(budget, threshold=None): наибольшее число запросов '
+        'к базе в тесте и число повторов, после которого запрос считается '
+        'N+1'
+    )
+
+
+@contextmanager
+def check_query_budget(label, budget=None, threshold=None):
+    from django.conf import settings
+
+    from .querycount import QueryRecorder
+
+    recorder = QueryRecorder()
+    with recorder.record():
+        yield recorder
+    report = recorder.check(
+        label, budget, threshold or settings.QUERY_REPEAT_THRESHOLD
+    )
+    if report:
+        pytest.fail(report, pytrace=False)
+
+
+@pytest.fixture
+def query_budget(request):
+    """Контекстный менеджер, проваливающий тест при превышении бюджета."""
+    return partial(check_query_budget, request.node.nodeid)
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_pyfunc_call(pyfuncitem):
+    marker = pyfuncitem.get_closest_marker('query_budget')
+    if marker is None:
+        return (yield)
+    with check_query_budget(
+        pyfuncitem.nodeid, *marker.args, **marker.kwargs
+    ):
+        return (yield)
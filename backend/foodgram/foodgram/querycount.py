@@ -0,0 +1,169 @@
+"""
+Поиск N+1 запросов для разработки и тестов.
+
+QueryCountMiddleware записывает запросы к базе на время обработки
+запроса и сравнивает их число с бюджетом представления. Запросы, которые
+отличаются только параметрами, сводятся к одному отпечатку: если отпечаток
+повторился QUERY_REPEAT_THRESHOLD раз, в отчёт попадает место в коде и
+поле сериализатора, из которых выполнялся запрос.
+
+Запросы записываются в потоке, который обрабатывает запрос, поэтому
+проверка рассчитана на WSGI, runserver и тесты.
+"""
+import logging
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from rest_framework.serializers import Serializer
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_PATTERN = re.compile(r'\((?:%s, )+%s\)')
+NUMBER_PATTERN = re.compile(r'\b\d+\b')
+# Методы сериализатора, в цикле которых по полям выполняются запросы.
+SERIALIZER_METHODS = ('to_representation', 'to_internal_value')
+# Сколько кадров кода приложений и разных мест вызова показывать.
+SOURCE_FRAMES = 3
+SOURCES_PER_QUERY = 3
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def get_fingerprint(sql):
+    """SQL без параметров: списки IN и числа в LIMIT не различаются."""
+    return NUMBER_PATTERN.sub('N', IN_LIST_PATTERN.sub('(...)', sql))
+
+
+def is_app_file(filename):
+    """Код приложений, без пакета настроек проекта и manage.py."""
+    base_dir = str(settings.BASE_DIR)
+    return (
+        filename.startswith(base_dir)
+        and 'site-packages' not in filename
+        and not filename.startswith(f'{base_dir}/foodgram/')
+        and not filename.endswith('manage.py')
+    )
+
+
+def get_source(frame):
+    """Строки кода проекта и поле сериализатора, выполнившие запрос."""
+    lines = []
+    field = None
+    while frame is not None:
+        code = frame.f_code
+        if len(lines) < SOURCE_FRAMES and is_app_file(code.co_filename):
+            lines.append(
+                f'{code.co_filename}:{frame.f_lineno} in {code.co_name}'
+            )
+        if field is None and code.co_name in SERIALIZER_METHODS:
+            serializer = frame.f_locals.get('self')
+            current = frame.f_locals.get('field')
+            if isinstance(serializer, Serializer) and current is not None:
+                field = f'{type(serializer).__name__}.{current.field_name}'
+        frame = frame.f_back
+    return field, tuple(lines)
+
+
+class QueryRecorder:
+    """Записывает запросы ко всем базам через connection.execute_wrapper."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(
+            (get_fingerprint(sql), sql, get_source(sys._getframe(1)))
+        )
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def get_repeated(self, threshold):
+        """Повторённые запросы: число, пример SQL и разные места вызова."""
+        counts = Counter(fingerprint for fingerprint, _, _ in self.queries)
+        repeated = {}
+        for fingerprint, sql, source in self.queries:
+            if counts[fingerprint] < threshold:
+                continue
+            _, sources = repeated.setdefault(
+                fingerprint, (sql, {})
+            )
+            sources[source] = None
+        return [
+            (counts[fingerprint], sql, list(sources))
+            for fingerprint, (sql, sources) in repeated.items()
+        ]
+
+    def check(self, label, budget, threshold):
+        """Текст отчёта, если бюджет превышен или найдены N+1 запросы."""
+        repeated = self.get_repeated(threshold)
+        over_budget = budget is not None and len(self.queries) > budget
+        if not over_budget and not repeated:
+            return None
+
+        report = [
+            f'{label}: {len(self.queries)} запросов к базе'
+            + (f' при бюджете {budget}' if budget is not None else '')
+        ]
+        for count, sql, sources in repeated:
+            report.append(f'  повторён {count} раз: {sql[:300]}')
+            for field, lines in sources[:SOURCES_PER_QUERY]:
+                report.append(f'    поле сериализатора {field or "-"}')
+                report.extend(f'      {line}' for line in lines)
+        return '\n'.join(report)
+
+
+def get_query_budget(method, view_name):
+    budgets = settings.QUERY_BUDGETS
+    return budgets.get(
+        f'{method} {view_name}', budgets.get(view_name, settings.QUERY_BUDGET)
+    )
+
+
+def report_queries(report):
+    if settings.QUERY_BUDGET_RAISE:
+        raise QueryBudgetExceeded(report)
+    logger.warning(report)
+
+
+class QueryCountMiddleware:
+    """
+    Проверяет число запросов к базе на каждый HTTP-запрос.
+
+    Бюджет задаётся в QUERY_BUDGETS по имени маршрута, с методом
+    ('POST recipe-list') или без него, для остальных маршрутов действует
+    QUERY_BUDGET. При превышении отчёт пишется в лог
+    или, с QUERY_BUDGET_RAISE, запрос завершается ошибкой.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with recorder.record():
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        response['X-Query-Count'] = len(recorder.queries)
+        report = recorder.check(
+            f'{request.method} {request.path} ({view_name})',
+            get_query_budget(request.method, view_name),
+            settings.QUERY_REPEAT_THRESHOLD
+        )
+        if report:
+            report_queries(report)
+        return response
@@ -23,7 +23,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv('SECRET_KEY', 'secretkey')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = os.getenv('DEBUG', False).lower() in ('true', '1', 't')
+DEBUG = os.getenv('DEBUG', 'false').lower() in ('true', '1', 't')
 
 ALLOWED_HOSTS = []
 HOSTS = os.getenv('HOSTS')
@@ -52,6 +52,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,6 +61,28 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Поиск N+1 запросов, см. foodgram/querycount.py. По умолчанию включён
+# при DEBUG: отчёт о превышении бюджета пишется в лог, а с
+# QUERY_BUDGET_RAISE запрос завершается ошибкой.
+QUERY_COUNT_CHECK = os.getenv(
+    'QUERY_COUNT_CHECK', str(DEBUG)
+).lower() in ('true', '1', 't')
+QUERY_BUDGET_RAISE = os.getenv(
+    'QUERY_BUDGET_RAISE', 'false'
+).lower() in ('true', '1', 't')
+# Сколько запросов допускается на маршрут: по имени маршрута, с методом
+# или без него, для остальных - QUERY_BUDGET. Создание и изменение
+# рецепта проверяют каждый ингредиент отдельным запросом.
+QUERY_BUDGET = 20
+QUERY_BUDGETS = {
+    'POST recipe-list': 60,
+    'PATCH recipe-detail': 60,
+}
+# Сколько раз запрос с разными параметрами считается N+1.
+QUERY_REPEAT_THRESHOLD = 5
+if QUERY_COUNT_CHECK:
+    MIDDLEWARE.insert(0, 'foodgram.querycount.QueryCountMiddleware')
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -80,6 +103,20 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# Под ASGI-сервером эндпоинты чтения выполняются в пуле потоков,
+# см. api/async_views.py. Включается автоматически в foodgram/asgi.py.
+ASYNC_READ_VIEWS = os.getenv(
+    'ASYNC_READ_VIEWS', 'false'
+).lower() in ('true', '1', 't')
+
+# Поток событий /api/recipes/events/ (только под ASGI): как часто
+# проверять новые рецепты и отправлять пустые сообщения для поддержания
+# соединения.
+EVENTS_POLL_SECONDS = 2
+EVENTS_HEARTBEAT_SECONDS = 15
+# Сколько секунд действует билет ?ticket= для подключения к потоку.
+EVENTS_TICKET_MAX_AGE = 60 * 60
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -100,10 +137,64 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
     }
 }
 
+# Реплики для чтения: DB_REPLICA_HOSTS=host1,host2:5433
+for index, replica in enumerate(
+    host for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host
+):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Для локальной отладки с репликой:
+# DATABASES['replica_0'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': BASE_DIR / 'db_replica.sqlite3',
+#     'TEST': {'MIRROR': 'default'},
+# }
+
+DATABASE_ROUTERS = ['foodgram.db_router.ReplicaRouter']
+
+# Сколько секунд после записи клиент читает из основной базы.
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 5))
+# Проверять соединение с репликой перед использованием.
+DB_REPLICA_HEALTH_CHECKS = os.getenv(
+    'DB_REPLICA_HEALTH_CHECKS', 'true'
+).lower() in ('true', '1', 't')
+# Через сколько секунд повторно пробовать недоступную реплику.
+DB_REPLICA_RETRY_SECONDS = int(os.getenv('DB_REPLICA_RETRY_SECONDS', 30))
+
+# Общий для всех воркеров кеш: CACHE_LOCATION=memcached:11211
+# В кеше recipes лежат представления рецептов, избранное и версия
+# справочников, их сбрасывают сигналы. Без общего кеша он отключён:
+# сброс в одном процессе не дошёл бы до остальных.
+if os.getenv('CACHE_LOCATION'):
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': os.getenv('CACHE_LOCATION').split(','),
+    }
+    CACHES = {
+        'default': SHARED_CACHE,
+        'recipes': SHARED_CACHE,
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'recipes': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -154,17 +245,79 @@ STATIC_ROOT = '/app/static_django/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# SQLite для локальной отладки не поддерживает include в уникальном
+# ограничении RecipeIngredient и просто не создаёт его.
+SILENCED_SYSTEM_CHECKS = ['models.W039']
+
 AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.MessagePackRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'api.parsers.MessagePackParser',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.ActionRateThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'create': '30/hour',
+        'favorite': '120/minute',
+        'subscribe': '60/minute',
+        'download_shopping_cart': '10/minute',
+        'user_list': '60/minute',
+    },
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.FoodgramPagination',
     'PAGE_SIZE': 10,
     'SEARCH_PARAM': 'name',
 }
 
+# Лента рецептов от авторов из подписок.
+FEED_TIMELINE_LENGTH = 500
+# Рецепты авторов с большим числом подписчиков выбираются при чтении ленты.
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+FEED_FANOUT_CACHE_TIMEOUT = 600
+
+# Период полураспада веса добавлений для сортировки ?ordering=trending.
+RANKING_HALF_LIFE_HOURS = 24
+
+# Индекс похожих рецептов: сколько соседей хранить, вес общих тегов и доля
+# рецептов, начиная с которой ингредиент не учитывается в сходстве.
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_RECIPES_TAG_BOOST = 0.1
+SIMILAR_RECIPES_MAX_INGREDIENT_SHARE = 0.2
+
+# Фасеты ?facets=tags,author: сколько групп отдавать и сколько секунд
+# хранить счётчики для запросов без фильтров по избранному и покупкам.
+RECIPE_FACETS_LIMIT = 50
+RECIPE_FACETS_CACHE_TIMEOUT = 60
+
+# Сколько рецептов можно запросить одним /api/recipes/batch/?ids=.
+RECIPE_BATCH_MAX_IDS = 100
+
+# Синхронизация /api/recipes/changes/: сколько рецептов отдавать за раз,
+# на сколько секунд отставать от текущего времени, чтобы не пропустить
+# изменения из ещё не зафиксированных транзакций, и сколько дней хранить
+# сведения об удалённых рецептах. Отставание должно быть больше самой
+# долгой транзакции, меняющей рецепты, см. README.
+RECIPE_CHANGES_PAGE_SIZE = 100
+RECIPE_CHANGES_LAG_SECONDS = int(os.getenv('RECIPE_CHANGES_LAG_SECONDS', 10))
+RECIPE_TOMBSTONE_DAYS = 30
+
+# Сколько секунд хранится общая для всех пользователей часть рецепта.
+RECIPE_CACHE_TIMEOUT = 60 * 60 * 24
+# Сколько секунд хранятся id рецептов в избранном и списке покупок.
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+
 DJOSER = {
     'HIDE_USERS': False,
     'LOGIN_FIELD': 'email',
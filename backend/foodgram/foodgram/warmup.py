@@ -0,0 +1,36 @@
+import importlib
+
+from django.db import connections
+from django.urls import get_resolver
+
+# Тяжёлые модули, которые в воркере нужны только отдельным эндпоинтам.
+WARMUP_MODULES = (
+    'reportlab.pdfgen.canvas',
+    'reportlab.pdfbase.pdfmetrics',
+    'reportlab.pdfbase.ttfonts',
+    'msgpack',
+    'PIL.Image',
+)
+
+
+def warmup():
+    """
+    Загружает всё, что воркеру понадобится при первых запросах.
+
+    Вызывается в мастер-процессе gunicorn до запуска воркеров, чтобы
+    загруженные модули и шрифт делились между ними через copy-on-write.
+    """
+    for module in WARMUP_MODULES:
+        importlib.import_module(module)
+
+    from PIL import Image
+
+    from api.exports import register_pdf_font
+
+    Image.init()
+    register_pdf_font()
+    # Импорт всех представлений и сборка маршрутов.
+    get_resolver().url_patterns
+
+    # Соединения с базой не должны достаться воркерам от мастера.
+    connections.close_all()
@@ -0,0 +1,22 @@
+import os
+
+# Приложение загружается в мастер-процессе и прогревается до запуска
+# воркеров: общие модули не загружаются заново в каждом воркере и
+# занимают память один раз благодаря copy-on-write.
+bind = '0.0.0.0:8000'
+preload_app = True
+
+
+def on_starting(server):
+    # Локальные кеши процессов не согласованы между воркерами: закрепление
+    # за основной базой и счётчики ограничений видит только один воркер.
+    if server.cfg.workers > 1 and not os.getenv('CACHE_LOCATION'):
+        raise RuntimeError(
+            'Для нескольких воркеров нужен общий кеш, задайте CACHE_LOCATION.'
+        )
+
+
+def when_ready(server):
+    from django.core.management import call_command
+
+    call_command('warmup')
@@ -1,5 +1,11 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 
+from .deletion import mark_recipes_deleted
 from .models import (
     Favorite,
     Follow,
@@ -10,28 +16,128 @@ from .models import (
     Tag
 )
 
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор с приблизительным числом строк для больших таблиц.
+
+    Для списка без фильтров на PostgreSQL число строк берётся из
+    статистики планировщика, а не через COUNT(*) по всей таблице. Если
+    менеджер модели сам фильтрует строки, статистику нужно брать по
+    частичному индексу с тем же условием (relation).
+    """
+
+    def __init__(self, *args, relation=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.relation = relation
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and self.is_unfiltered(query):
+            connection = connections[self.object_list.db]
+            if connection.vendor == 'postgresql':
+                relation = (
+                    self.relation or self.object_list.model._meta.db_table
+                )
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT reltuples FROM pg_class WHERE relname = %s',
+                        [relation]
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] > ESTIMATED_COUNT_THRESHOLD:
+                    return int(row[0])
+        return super().count
+
+    def is_unfiltered(self, query):
+        manager = self.object_list.model._default_manager
+        manager_where = manager.all().query.where
+        if manager_where and self.relation is None:
+            return False
+        return query.where == manager_where
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Частичный индекс с условием менеджера модели, см.
+    # EstimatedCountPaginator.
+    estimated_count_relation = None
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            relation=self.estimated_count_relation
+        )
+
 
 class RecipeIngredientInLine(admin.TabularInline):
     model = RecipeIngredient
     extra = 0
+    autocomplete_fields = ('ingredient',)
 
 
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     list_display = ('name', 'author', 'favorite_users_count')
-    list_filter = ('author', 'name', 'tags')
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username')
+    autocomplete_fields = ('author',)
     inlines = (RecipeIngredientInLine,)
     filter_horizontal = ('tags',)
+    actions = ('mark_deleted',)
+    estimated_count_relation = 'recipe_live_pub_date_idx'
 
+    def get_queryset(self, request):
+        favorites_count = Favorite.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            count=Count('id')
+        ).values('count')
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(Subquery(favorites_count), 0)
+        )
 
-class IngredientAdmin(admin.ModelAdmin):
+    def favorite_users_count(self, obj):
+        return obj.favorites_count
+
+    favorite_users_count.short_description = 'Число добавлений в избранное'
+    favorite_users_count.admin_order_field = 'favorites_count'
+
+    @admin.action(description='Удалить в фоне')
+    def mark_deleted(self, request, queryset):
+        mark_recipes_deleted(queryset)
+
+
+class IngredientAdmin(LargeTableAdmin):
     list_display = ('name', 'measurement_unit')
-    list_filter = ('name',)
+    search_fields = ('name',)
+    ordering = ('name',)
+
+
+class RecipeIngredientAdmin(LargeTableAdmin):
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+
+
+class FollowAdmin(LargeTableAdmin):
+    list_select_related = ('user', 'following')
+    autocomplete_fields = ('user', 'following')
+
+
+class FavoriteShoppingListAdmin(LargeTableAdmin):
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
 
 
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Tag)
 admin.site.register(Recipe, RecipeAdmin)
-admin.site.register(RecipeIngredient)
-admin.site.register(Follow)
-admin.site.register(Favorite)
-admin.site.register(ShoppingList)
+admin.site.register(RecipeIngredient, RecipeIngredientAdmin)
+admin.site.register(Follow, FollowAdmin)
+admin.site.register(Favorite, FavoriteShoppingListAdmin)
+admin.site.register(ShoppingList, FavoriteShoppingListAdmin)
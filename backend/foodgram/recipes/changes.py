@@ -0,0 +1,138 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import RecipeTombstone
+
+CHANGES_SALT = 'recipes.changes'
+
+
+class CursorError(Exception):
+    pass
+
+
+class CursorExpired(CursorError):
+    pass
+
+
+def dump_cursor(recipes_position, tombstones_position):
+    return signing.dumps(
+        {
+            'recipes': encode_position(recipes_position),
+            'tombstones': encode_position(tombstones_position),
+        },
+        salt=CHANGES_SALT,
+        compress=True
+    )
+
+
+def encode_position(position):
+    moment, last_id = position
+    return [moment.isoformat(), last_id]
+
+
+def load_cursor(token):
+    """
+    Позиции в рецептах и удалениях, до которых клиент уже дошёл.
+
+    Без токена синхронизация начинается с начала. Токен старше срока
+    хранения удалений не принимается: клиент мог пропустить удаления и
+    должен загрузить рецепты заново.
+    """
+    if not token:
+        return None, None
+    try:
+        data = signing.loads(token, salt=CHANGES_SALT)
+        positions = tuple(
+            (parse_datetime(data[key][0]), data[key][1])
+            for key in ('recipes', 'tombstones')
+        )
+    except (signing.BadSignature, KeyError, IndexError, TypeError,
+            ValueError):
+        raise CursorError('Некорректный токен синхронизации.')
+    if None in (moment for moment, _ in positions):
+        raise CursorError('Некорректный токен синхронизации.')
+
+    expires = timezone.now() - timedelta(days=settings.RECIPE_TOMBSTONE_DAYS)
+    if positions[1][0] < expires:
+        raise CursorExpired(
+            'Токен синхронизации устарел, загрузите рецепты заново.'
+        )
+    return positions
+
+
+def changed_after(queryset, field, position):
+    if position is None:
+        return queryset
+    moment, last_id = position
+    if last_id is None:
+        return queryset.filter(**{f'{field}__gt': moment})
+    return queryset.filter(
+        Q(**{f'{field}__gt': moment})
+        | Q(**{field: moment, 'id__gt': last_id})
+    )
+
+
+def read_page(queryset, field, position, until, limit):
+    """
+    Следующие limit записей после position, изменённые не позже until.
+
+    Возвращает записи, позицию для следующего запроса и признак того,
+    что изменения ещё остались.
+    """
+    rows = list(
+        changed_after(queryset, field, position).filter(
+            **{f'{field}__lte': until}
+        ).order_by(field, 'id')[:limit + 1]
+    )
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, (getattr(rows[-1], field), rows[-1].id), True
+    # Всё до until уже отдано: следующий запрос начнётся после until.
+    return rows, (until, None), False
+
+
+def get_committed_until():
+    """
+    Граница, до которой изменения считаются зафиксированными.
+
+    Изменения последних RECIPE_CHANGES_LAG_SECONDS секунд не отдаются:
+    транзакция, начатая раньше, может зафиксироваться позже и получить
+    более раннюю дату изменения, чем уже отданные записи.
+    """
+    return timezone.now() - timedelta(
+        seconds=settings.RECIPE_CHANGES_LAG_SECONDS
+    )
+
+
+def get_changes(recipes, token):
+    """
+    Рецепты из recipes и id удалённых рецептов, изменившиеся после token
+    и не позже get_committed_until().
+    """
+    recipes_position, tombstones_position = load_cursor(token)
+    until = get_committed_until()
+    limit = settings.RECIPE_CHANGES_PAGE_SIZE
+    recipes, recipes_position, recipes_left = read_page(
+        recipes, 'modified', recipes_position, until, limit
+    )
+    if token:
+        tombstones, tombstones_position, tombstones_left = read_page(
+            RecipeTombstone.objects.all(), 'deleted_at',
+            tombstones_position, until, limit
+        )
+    else:
+        # При первой синхронизации удалённые рецепты клиенту не нужны.
+        tombstones, tombstones_position, tombstones_left = (
+            [], (until, None), False
+        )
+    return {
+        'recipes': recipes,
+        'deleted': [tombstone.recipe_id for tombstone in tombstones],
+        'next': dump_cursor(recipes_position, tombstones_position),
+        'has_more': recipes_left or tombstones_left,
+    }
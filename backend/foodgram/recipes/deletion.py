@@ -0,0 +1,169 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from .feed import get_fanout_on_read_followings, refresh_fanout_author
+from .models import (
+    Favorite,
+    Follow,
+    Recipe,
+    RecipeIngredient,
+    RecipeRanking,
+    RecipeTombstone,
+    ShoppingList,
+    SimilarRecipe,
+    SimilarRecipeQueue,
+    TimelineEntry,
+    User
+)
+from .signals import recipes_marked_deleted
+
+# Строки, ссылающиеся на рецепт или пользователя. Удаляются пачками до
+# удаления самой записи, чтобы Django не собирал их в памяти разом.
+RECIPE_DEPENDENTS = (
+    (Recipe.tags.through, 'recipe_id'),
+    (RecipeIngredient, 'recipe_id'),
+    (Favorite, 'recipe_id'),
+    (ShoppingList, 'recipe_id'),
+    (TimelineEntry, 'recipe_id'),
+    (SimilarRecipe, 'recipe_id'),
+    (SimilarRecipe, 'similar_recipe_id'),
+    (SimilarRecipeQueue, 'recipe_id'),
+    (RecipeRanking, 'recipe_id'),
+)
+USER_DEPENDENTS = (
+    (Favorite, 'user_id'),
+    (ShoppingList, 'user_id'),
+    (Follow, 'user_id'),
+    (Follow, 'following_id'),
+    (TimelineEntry, 'user_id'),
+)
+# Удалённый пользователь получает имя deleted:<id> и email
+# deleted:<id>@deleted.invalid. Двоеточие не проходит валидацию имени и
+# email, поэтому такие значения нельзя получить при регистрации.
+DELETED_NAME_PREFIX = 'deleted:'
+DELETED_EMAIL_DOMAIN = '@deleted.invalid'
+
+
+def hide_recipes(recipe_ids):
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        is_deleted=True, modified=timezone.now()
+    )
+    RecipeTombstone.objects.bulk_create(
+        RecipeTombstone(recipe_id=recipe_id) for recipe_id in recipe_ids
+    )
+    recipes_marked_deleted.send(sender=Recipe, recipe_ids=recipe_ids)
+
+
+def mark_recipes_deleted(queryset):
+    """Скрывает рецепты из API, строки удалит команда processdeletions."""
+    with transaction.atomic():
+        hide_recipes(list(queryset.values_list('id', flat=True)))
+
+
+def mark_users_deleted(queryset):
+    """
+    Отключает пользователей и скрывает их рецепты из API.
+
+    Email и имя пользователя сразу освобождаются для новой регистрации.
+    """
+    with transaction.atomic():
+        user_ids = list(queryset.values_list('id', flat=True))
+        deleted_name = Concat(
+            Value(DELETED_NAME_PREFIX), Cast('id', output_field=CharField())
+        )
+        User.objects.filter(id__in=user_ids).update(
+            is_deleted=True,
+            is_active=False,
+            username=deleted_name,
+            email=Concat(deleted_name, Value(DELETED_EMAIL_DOMAIN))
+        )
+        hide_recipes(
+            list(
+                Recipe.objects.filter(author_id__in=user_ids).values_list(
+                    'id', flat=True
+                )
+            )
+        )
+        Token.objects.filter(user_id__in=user_ids).delete()
+
+
+def reset_user_rankings(user_ids):
+    """
+    Сбрасывает рейтинги рецептов, которые удаляемые пользователи добавили
+    в избранное или список покупок: строки удаляются без сигналов.
+    """
+    for model in (Favorite, ShoppingList):
+        RecipeRanking.objects.filter(
+            recipe_id__in=model._base_manager.filter(
+                user_id__in=user_ids
+            ).values('recipe_id')
+        ).update(updated_at=None)
+
+
+def delete_in_batches(model, field, parent_ids, batch_size):
+    """Удаляет строки, ссылающиеся на parent_ids, пачками по batch_size."""
+    queryset = model._base_manager.filter(**{f'{field}__in': parent_ids})
+    deleted = 0
+    while True:
+        batch = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        # Удаление одним запросом, без загрузки объектов и сигналов:
+        # рецепт или пользователь уже скрыт и будет удалён следом.
+        batch_queryset = model._base_manager.filter(pk__in=batch)
+        deleted += batch_queryset._raw_delete(batch_queryset.db)
+
+
+def purge(model, dependents, parent_ids, batch_size, report):
+    for dependent, field in dependents:
+        deleted = delete_in_batches(dependent, field, parent_ids, batch_size)
+        if deleted:
+            report(dependent, deleted)
+    deleted, _ = model._base_manager.filter(id__in=parent_ids).delete()
+    return deleted
+
+
+def process_deletions(batch_size, report):
+    """
+    Удаляет помеченные рецепты и пользователей.
+
+    За один шаг обрабатывается не больше batch_size родительских записей,
+    каждая пачка зависимых строк удаляется в своей транзакции.
+    """
+    for model, dependents in (
+        (Recipe, RECIPE_DEPENDENTS),
+        (User, USER_DEPENDENTS),
+    ):
+        pending = model._base_manager.filter(is_deleted=True)
+        while True:
+            parent_ids = list(
+                pending.values_list('id', flat=True)[:batch_size]
+            )
+            if not parent_ids:
+                break
+            authors = set()
+            if model is User:
+                reset_user_rankings(parent_ids)
+                authors = get_fanout_on_read_followings(parent_ids)
+            report(
+                model,
+                purge(model, dependents, parent_ids, batch_size, report)
+            )
+            # Подписки удалены без сигналов.
+            for author_id in authors:
+                refresh_fanout_author(author_id)
+
+    expired, _ = RecipeTombstone.objects.filter(
+        deleted_at__lt=timezone.now() - timedelta(
+            days=settings.RECIPE_TOMBSTONE_DAYS
+        )
+    ).delete()
+    if expired:
+        report(RecipeTombstone, expired)
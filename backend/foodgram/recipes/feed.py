@@ -0,0 +1,161 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Q, Subquery
+
+from .models import Follow, Recipe, TimelineEntry
+
+FANOUT_ON_READ_CACHE_KEY = 'feed-fanout-on-read-authors'
+BATCH_SIZE = 1000
+
+
+def get_fanout_on_read_authors():
+    """
+    Авторы, чьи рецепты не раскладываются по лентам подписчиков.
+
+    Для автора с большим числом подписчиков запись в ленты обходится
+    дороже, чем выборка его рецептов при чтении ленты.
+    """
+    return cache.get_or_set(
+        FANOUT_ON_READ_CACHE_KEY,
+        lambda: set(
+            Follow.objects.values('following').annotate(
+                followers_count=Count('id')
+            ).filter(
+                followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+            ).values_list('following', flat=True)
+        ),
+        settings.FEED_FANOUT_CACHE_TIMEOUT
+    )
+
+
+def trim_timelines(user_ids):
+    cutoff = TimelineEntry.objects.filter(
+        user=OuterRef('user')
+    ).order_by('-pub_date').values('pub_date')[
+        settings.FEED_TIMELINE_LENGTH - 1:settings.FEED_TIMELINE_LENGTH
+    ]
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        TimelineEntry.objects.filter(
+            user_id__in=user_ids[start:start + BATCH_SIZE],
+            pub_date__lt=Subquery(cutoff)
+        ).delete()
+
+
+def add_to_timelines(user_ids, recipes):
+    """Раскладывает рецепты (пары id, pub_date) по лентам user_ids."""
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id, recipe_id=recipe_id, pub_date=pub_date
+            )
+            for user_id in user_ids
+            for recipe_id, pub_date in recipes
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    trim_timelines(user_ids)
+
+
+def get_recent_recipes(author_id):
+    return list(
+        Recipe.objects.filter(author_id=author_id).order_by(
+            '-pub_date'
+        ).values_list('id', 'pub_date')[:settings.FEED_TIMELINE_LENGTH]
+    )
+
+
+def get_follower_ids(author_id):
+    return list(
+        Follow.objects.filter(following_id=author_id).values_list(
+            'user_id', flat=True
+        )
+    )
+
+
+def fanout_recipe(recipe):
+    if recipe.author_id in get_fanout_on_read_authors():
+        return
+
+    add_to_timelines(
+        get_follower_ids(recipe.author_id), [(recipe.id, recipe.pub_date)]
+    )
+
+
+def backfill_follow(follow):
+    if follow.following_id in get_fanout_on_read_authors():
+        return
+
+    add_to_timelines(
+        [follow.user_id], get_recent_recipes(follow.following_id)
+    )
+
+
+def add_follower(follow):
+    """Автор, перешедший через FEED_FANOUT_MAX_FOLLOWERS, читается напрямую."""
+    followers_count = Follow.objects.filter(
+        following_id=follow.following_id
+    ).count()
+    if followers_count == settings.FEED_FANOUT_MAX_FOLLOWERS + 1:
+        cache.delete(FANOUT_ON_READ_CACHE_KEY)
+    backfill_follow(follow)
+
+
+def refresh_fanout_author(author_id):
+    """
+    Раскладывает рецепты автора, у которого подписчиков стало не больше
+    FEED_FANOUT_MAX_FOLLOWERS.
+
+    Пока подписчиков было больше, его рецепты в ленты не попадали, и без
+    этого лента перестала бы их показывать.
+    """
+    followers_count = Follow.objects.filter(following_id=author_id).count()
+    if followers_count > settings.FEED_FANOUT_MAX_FOLLOWERS:
+        return
+    # Сравнение с кешированным списком ловит и одновременные отписки,
+    # после которых ни один обработчик не видит ровно границу.
+    if (
+        followers_count == settings.FEED_FANOUT_MAX_FOLLOWERS
+        or author_id in get_fanout_on_read_authors()
+    ):
+        cache.delete(FANOUT_ON_READ_CACHE_KEY)
+        add_to_timelines(
+            get_follower_ids(author_id), get_recent_recipes(author_id)
+        )
+
+
+def get_fanout_on_read_followings(user_ids):
+    """Авторы, читаемые напрямую, на которых подписаны user_ids."""
+    return set(
+        Follow.objects.filter(
+            user_id__in=user_ids,
+            following_id__in=get_fanout_on_read_authors()
+        ).values_list('following_id', flat=True)
+    )
+
+
+def remove_follow(follow):
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id,
+        recipe__author_id=follow.following_id
+    ).delete()
+
+
+def get_feed_queryset(user, queryset):
+    """Рецепты из ленты пользователя и от авторов, читаемых напрямую."""
+    condition = Q(
+        id__in=TimelineEntry.objects.filter(user=user).values('recipe_id')
+    )
+
+    fanout_on_read_authors = get_fanout_on_read_authors()
+    if fanout_on_read_authors:
+        condition |= Q(
+            author_id__in=list(
+                Follow.objects.filter(
+                    user=user, following_id__in=fanout_on_read_authors
+                ).values_list('following_id', flat=True)
+            )
+        )
+
+    return queryset.filter(condition)
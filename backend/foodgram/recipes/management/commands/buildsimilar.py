@@ -0,0 +1,238 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+import numpy as np
+from scipy import sparse
+
+from recipes.models import (
+    Recipe,
+    RecipeIngredient,
+    SimilarRecipe,
+    SimilarRecipeQueue
+)
+
+CHUNK_SIZE = 10000
+# В небольшом каталоге частота ингредиента мало о чём говорит, такие
+# ингредиенты не отбрасываются.
+MIN_COMMON_FREQUENCY = 100
+
+
+def load_pairs(queryset, row_field, col_field):
+    """
+    Пары (рецепт, ингредиент или тег). Скрытых рецептов нет в recipe_ids,
+    их строки отбрасываются.
+    """
+    pairs = np.fromiter(
+        (
+            value
+            for pair in queryset.filter(
+                recipe__is_deleted=False
+            ).values_list(
+                row_field, col_field
+            ).iterator(chunk_size=CHUNK_SIZE)
+            for value in pair
+        ),
+        dtype=np.int64
+    )
+    return pairs[0::2], pairs[1::2]
+
+
+def build_incidence(recipe_ids, rows, cols):
+    """Разреженная бинарная матрица рецепт x ингредиент (или тег)."""
+    row_index = np.searchsorted(recipe_ids, rows)
+    col_values, col_index = np.unique(cols, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (row_index, col_index)),
+        shape=(len(recipe_ids), len(col_values))
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+def drop_common_columns(matrix, max_share):
+    """Убирает ингредиенты, которые есть больше чем в max_share рецептов."""
+    frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    keep = frequency <= max(
+        max_share * matrix.shape[0], MIN_COMMON_FREQUENCY
+    )
+    return matrix[:, np.flatnonzero(keep)].tocsr(), frequency[keep]
+
+
+def find_neighbours(matrix, index):
+    """Рецепты, у которых есть общие ингредиенты с рецептами index."""
+    columns = np.unique(matrix[index].indices)
+    rows = matrix.tocsc()[:, columns].tocoo().row
+    return np.union1d(index, rows)
+
+
+def split_by_pairs(index, costs, batch_size, max_pairs):
+    """
+    Делит index на пачки не длиннее batch_size, в которых произведение
+    матриц даёт не больше max_pairs пар (но не меньше одного рецепта).
+    """
+    total = np.cumsum(costs[index])
+    start = 0
+    while start < len(index):
+        done = total[start - 1] if start else 0
+        end = np.searchsorted(total, done + max_pairs, side='right')
+        end = min(max(end, start + 1), start + batch_size)
+        yield index[start:end]
+        start = end
+
+
+def overlap_scores(intersection, size_a, size_b, metric):
+    if metric == 'cosine':
+        denominator = np.sqrt(size_a * size_b)
+    else:
+        denominator = size_a + size_b - intersection
+    return np.divide(
+        intersection,
+        denominator,
+        out=np.zeros_like(intersection, dtype=np.float64),
+        where=denominator > 0
+    )
+
+
+def top_k(rows, cols, scores, k):
+    order = np.lexsort((-scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    starts = np.searchsorted(rows, rows, side='left')
+    keep = np.arange(len(rows)) - starts < k
+    return rows[keep], cols[keep], scores[keep]
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит индекс похожих рецептов по составу ингредиентов. '
+        'Без --full пересчитывает изменённые и новые рецепты и рецепты '
+        'с общими с ними ингредиентами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать похожие рецепты для всех рецептов'
+        )
+        parser.add_argument(
+            '--metric',
+            choices=('jaccard', 'cosine'),
+            default='jaccard',
+            help='Мера сходства наборов ингредиентов'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=512,
+            help='Сколько рецептов обрабатывать за один шаг'
+        )
+        parser.add_argument(
+            '--max-pairs',
+            type=int,
+            default=5000000,
+            help='Сколько пар рецептов сравнивать за один шаг'
+        )
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        recipe_ids = np.fromiter(
+            Recipe.objects.order_by('id').values_list(
+                'id', flat=True
+            ).iterator(chunk_size=CHUNK_SIZE),
+            dtype=np.int64
+        )
+        if not len(recipe_ids):
+            return
+
+        # Частые ингредиенты (соль, вода) не делают рецепты похожими, но
+        # дают основную часть пар в произведении матриц.
+        ingredients, frequency = drop_common_columns(
+            build_incidence(
+                recipe_ids,
+                *load_pairs(RecipeIngredient.objects.all(), 'recipe_id',
+                            'ingredient_id')
+            ),
+            settings.SIMILAR_RECIPES_MAX_INGREDIENT_SHARE
+        )
+        tags = build_incidence(
+            recipe_ids,
+            *load_pairs(Recipe.tags.through.objects.all(), 'recipe_id',
+                        'tag_id')
+        ).toarray().astype(bool)
+        ingredient_sizes = np.asarray(ingredients.sum(axis=1)).ravel()
+        tag_sizes = tags.sum(axis=1)
+
+        if options['full']:
+            target_index = np.arange(len(recipe_ids))
+        else:
+            # Изменённый рецепт может войти в соседи или выпасть из соседей
+            # рецептов с общими ингредиентами, их тоже нужно пересчитать.
+            changed_ids = np.fromiter(
+                SimilarRecipeQueue.objects.filter(
+                    recipe__is_deleted=False
+                ).order_by('recipe_id').values_list('recipe_id', flat=True),
+                dtype=np.int64
+            )
+            target_index = find_neighbours(
+                ingredients, np.searchsorted(recipe_ids, changed_ids)
+            )
+
+        costs = ingredients @ frequency
+        done = 0
+        for batch in split_by_pairs(
+            target_index, costs, options['batch_size'], options['max_pairs']
+        ):
+            self.refresh_batch(
+                batch, recipe_ids, ingredients, ingredient_sizes,
+                tags, tag_sizes, options['metric']
+            )
+            done += len(batch)
+            self.stdout.write(
+                f'Обработано рецептов: {done} из {len(target_index)}'
+            )
+
+        # Рецепты, изменённые во время пересчёта, остаются в очереди.
+        SimilarRecipeQueue.objects.filter(queued_at__lte=started).delete()
+
+        self.stdout.write(self.style.SUCCESS('Индекс похожих рецептов готов'))
+
+    def refresh_batch(self, batch, recipe_ids, ingredients, ingredient_sizes,
+                      tags, tag_sizes, metric):
+        intersection = (ingredients[batch] @ ingredients.T).tocoo()
+        rows, cols = intersection.row, intersection.col
+        not_self = batch[rows] != cols
+        rows, cols = rows[not_self], cols[not_self]
+        shared = intersection.data[not_self].astype(np.float64)
+
+        scores = overlap_scores(
+            shared, ingredient_sizes[batch[rows]], ingredient_sizes[cols],
+            metric
+        )
+        shared_tags = (tags[batch[rows]] & tags[cols]).sum(axis=1)
+        scores += settings.SIMILAR_RECIPES_TAG_BOOST * overlap_scores(
+            shared_tags.astype(np.float64), tag_sizes[batch[rows]],
+            tag_sizes[cols], 'jaccard'
+        )
+        rows, cols, scores = top_k(
+            rows, cols, scores, settings.SIMILAR_RECIPES_COUNT
+        )
+
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(
+                recipe_id__in=recipe_ids[batch].tolist()
+            ).delete()
+            SimilarRecipe.objects.bulk_create(
+                SimilarRecipe(
+                    recipe_id=recipe_id,
+                    similar_recipe_id=similar_recipe_id,
+                    score=score
+                )
+                for recipe_id, similar_recipe_id, score in zip(
+                    recipe_ids[batch[rows]].tolist(),
+                    recipe_ids[cols].tolist(),
+                    scores.tolist()
+                )
+            )
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import Recipe
+
+
+def get_used_images(prefix):
+    return set(
+        Recipe._base_manager.filter(image__startswith=prefix).values_list(
+            'image', flat=True
+        )
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы изображений, на которые не ссылается ни один '
+        'рецепт, в том числе помеченный на удаление.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours',
+            type=int,
+            default=24,
+            help='Файлы моложе стольких часов не удаляются'
+        )
+
+    def handle(self, *args, **options):
+        field = Recipe._meta.get_field('image')
+        deleted = field.storage.delete_unused_files(
+            field.upload_to,
+            get_used_images,
+            timezone.now() - timedelta(hours=options['grace_hours'])
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Удалено неиспользуемых файлов: {deleted}')
+        )
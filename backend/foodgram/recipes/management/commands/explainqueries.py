@@ -0,0 +1,112 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Sum
+
+from recipes.models import (
+    Favorite,
+    Follow,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList
+)
+
+PAGE_SIZE = 10
+
+
+def get_most_common(queryset, field):
+    row = queryset.values(field).annotate(
+        rows=Count('id')
+    ).order_by('-rows').first()
+    return row[field] if row else None
+
+
+def get_hot_queries():
+    """Запросы API и админки, под которые подобраны индексы."""
+    author_id = get_most_common(Recipe.objects.all(), 'author_id')
+    following_id = get_most_common(Follow.objects.all(), 'following_id')
+    recipe_id = get_most_common(Favorite.objects.all(), 'recipe_id')
+    user_id = get_most_common(ShoppingList.objects.all(), 'user_id')
+    page_ids = list(
+        Recipe.objects.order_by('-pub_date').values_list(
+            'id', flat=True
+        )[:PAGE_SIZE]
+    )
+    return (
+        (
+            'Список рецептов',
+            Recipe.objects.order_by('-pub_date', '-id')[:PAGE_SIZE]
+        ),
+        (
+            'Рецепты автора',
+            Recipe.objects.filter(author_id=author_id).order_by(
+                '-pub_date'
+            )[:PAGE_SIZE]
+        ),
+        (
+            'Ингредиенты страницы рецептов',
+            RecipeIngredient.objects.filter(
+                recipe_id__in=page_ids
+            ).select_related('ingredient')
+        ),
+        (
+            'Список покупок',
+            Ingredient.objects.filter(
+                recipeingredient__recipe__shoppinglist__user_id=user_id
+            ).values('name', 'measurement_unit').annotate(
+                total=Sum('recipeingredient__amount')
+            ).order_by('name')
+        ),
+        (
+            'Число подписчиков автора',
+            Follow.objects.filter(following_id=following_id).values(
+                'user_id'
+            )
+        ),
+        (
+            'Число добавлений рецепта в избранное',
+            Favorite.objects.filter(recipe_id=recipe_id).values('user_id')
+        ),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает планы и время выполнения запросов, для которых '
+        'в рецептах заведены индексы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Сколько раз выполнять каждый запрос для замера времени'
+        )
+        parser.add_argument(
+            '--no-plan',
+            action='store_true',
+            help='Не выводить планы запросов, только время'
+        )
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if connection.vendor == 'postgresql':
+            explain_options = {'analyze': True, 'buffers': True}
+
+        for name, queryset in get_hot_queries():
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - started)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name}: медиана {statistics.median(timings) * 1000:.2f} '
+                f'мс, максимум {max(timings) * 1000:.2f} мс'
+            ))
+            if not options['no_plan']:
+                self.stdout.write(queryset.explain(**explain_options))
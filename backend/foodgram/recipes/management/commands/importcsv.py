@@ -1,6 +1,7 @@
 import csv
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
 from recipes.models import Ingredient
 
@@ -17,7 +18,8 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         filename = options['filename']
-        with open(filename) as f:
+        # Одна транзакция: снимок справочника пересоберётся один раз.
+        with open(filename) as f, transaction.atomic():
             reader = csv.reader(f)
             created_count = 0
             for row in reader:
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipes.deletion import process_deletions
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет помеченные на удаление рецепты и пользователей вместе '
+        'со связанными строками, небольшими пачками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк удалять одним запросом'
+        )
+
+    def handle(self, *args, **options):
+        process_deletions(options['batch_size'], self.report)
+        self.stdout.write(self.style.SUCCESS('Помеченные записи удалены'))
+
+    def report(self, model, deleted):
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: удалено строк {deleted}'
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import backfill_follow
+from recipes.models import Follow
+
+
+class Command(BaseCommand):
+    help = 'Заполняет ленты подписчиков по уже существующим подпискам'
+
+    def handle(self, *args, **options):
+        follows_count = 0
+        for follow in Follow.objects.iterator(chunk_size=1000):
+            backfill_follow(follow)
+            follows_count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано {follows_count} подписок')
+        )
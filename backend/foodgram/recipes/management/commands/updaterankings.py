@@ -0,0 +1,153 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, RecipeRanking, ShoppingList
+
+EVENT_MODELS = (Favorite, ShoppingList)
+# События старше этого числа периодов полураспада не учитываются.
+TRENDING_HORIZON = 10
+MIN_TRENDING = 1e-3
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинги популярных и набирающих популярность '
+        'рецептов. Без --full учитывает добавления в избранное и список '
+        'покупок с прошлого запуска и заново считает рецепты, из которых '
+        'их удаляли.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать рейтинги всех рецептов'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        half_life = timedelta(hours=settings.RANKING_HALF_LIFE_HOURS)
+        self.create_missing_rankings()
+
+        # Все рецепты с ненулевым trending пересчитываются при каждом
+        # запуске, поэтому максимальная дата пересчёта - дата прошлого
+        # запуска.
+        last_run = RecipeRanking.objects.aggregate(
+            last_run=Max('updated_at')
+        )['last_run']
+        full = options['full'] or last_run is None
+        horizon = now - half_life * TRENDING_HORIZON
+
+        with transaction.atomic():
+            if full:
+                stale_ids = set()
+                RecipeRanking.objects.update(
+                    popular=0, trending=0, updated_at=now
+                )
+                trending = self.get_trending_increments(
+                    horizon, now, half_life
+                )
+                popular = self.get_popular_counts()
+            else:
+                # Новые рейтинги и рейтинги рецептов, из избранного или
+                # списка покупок которых удаляли записи (сигнал сбрасывает
+                # updated_at), считаются заново, а не прибавлением.
+                stale_ids = set(
+                    RecipeRanking.objects.select_for_update().filter(
+                        updated_at__isnull=True
+                    ).values_list('recipe_id', flat=True)
+                )
+                self.decay_trending(0.5 ** ((now - last_run) / half_life), now)
+                trending = self.get_trending_increments(
+                    last_run, now, half_life, exclude_ids=stale_ids
+                )
+                if stale_ids:
+                    trending.update(
+                        self.get_trending_increments(
+                            horizon, now, half_life, recipe_ids=stale_ids
+                        )
+                    )
+                popular = self.get_popular_counts(set(trending) | stale_ids)
+            updated_count = self.apply(
+                trending, popular, now, reset_ids=stale_ids
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Обновлено рейтингов: {updated_count}')
+        )
+
+    def create_missing_rankings(self):
+        RecipeRanking.objects.bulk_create(
+            (
+                RecipeRanking(recipe_id=recipe_id)
+                for recipe_id in Recipe.objects.filter(
+                    ranking__isnull=True
+                ).values_list('id', flat=True)
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+    def decay_trending(self, factor, now):
+        RecipeRanking.objects.filter(
+            trending__gt=0, trending__lt=MIN_TRENDING / factor
+        ).update(trending=0)
+        RecipeRanking.objects.filter(trending__gt=0).update(
+            trending=F('trending') * factor, updated_at=now
+        )
+
+    def get_trending_increments(self, since, now, half_life, recipe_ids=None,
+                                exclude_ids=()):
+        trending = defaultdict(float)
+        for model in EVENT_MODELS:
+            events = model.objects.filter(
+                added_date__gt=since, added_date__lte=now
+            )
+            if recipe_ids is not None:
+                events = events.filter(recipe_id__in=list(recipe_ids))
+            if exclude_ids:
+                events = events.exclude(recipe_id__in=list(exclude_ids))
+            events = events.values_list('recipe_id', 'added_date')
+            for recipe_id, added_date in events.iterator(
+                chunk_size=BATCH_SIZE
+            ):
+                trending[recipe_id] += 0.5 ** ((now - added_date) / half_life)
+        return trending
+
+    def get_popular_counts(self, recipe_ids=None):
+        popular = defaultdict(int)
+        for model in EVENT_MODELS:
+            counts = model.objects.all()
+            if recipe_ids is not None:
+                counts = counts.filter(recipe_id__in=list(recipe_ids))
+            for row in counts.values('recipe_id').annotate(
+                count=Count('id')
+            ).order_by():
+                popular[row['recipe_id']] += row['count']
+        return popular
+
+    def apply(self, trending, popular, now, reset_ids=()):
+        recipe_ids = sorted(set(trending) | set(popular) | set(reset_ids))
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            rankings = list(
+                RecipeRanking.objects.filter(
+                    recipe_id__in=recipe_ids[start:start + BATCH_SIZE]
+                )
+            )
+            for ranking in rankings:
+                if ranking.recipe_id in reset_ids:
+                    ranking.trending = 0
+                ranking.trending += trending.get(ranking.recipe_id, 0)
+                ranking.popular = popular.get(ranking.recipe_id, 0)
+                ranking.updated_at = now
+            RecipeRanking.objects.bulk_update(
+                rankings, ('trending', 'popular', 'updated_at')
+            )
+        return len(recipe_ids)
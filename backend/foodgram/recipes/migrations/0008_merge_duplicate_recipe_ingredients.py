@@ -0,0 +1,32 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:46
+
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    """Повторы ингредиента в рецепте сводятся в одну строку с суммой."""
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = RecipeIngredient.objects.values(
+        'recipe_id', 'ingredient_id'
+    ).annotate(
+        rows=Count('id'), keep_id=Min('id'), total=Sum('amount')
+    ).filter(rows__gt=1).order_by()
+    for duplicate in duplicates.iterator():
+        rows = RecipeIngredient.objects.filter(
+            recipe_id=duplicate['recipe_id'],
+            ingredient_id=duplicate['ingredient_id']
+        )
+        rows.exclude(id=duplicate['keep_id']).delete()
+        rows.update(amount=duplicate['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_modified_tombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
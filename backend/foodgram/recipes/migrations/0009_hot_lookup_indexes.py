@@ -0,0 +1,61 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+import recipes.operations
+
+
+class Migration(migrations.Migration):
+
+    # Индексы строятся CONCURRENTLY, вне транзакции.
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0008_merge_duplicate_recipe_ingredients'),
+    ]
+
+    operations = [
+        recipes.operations.AddIndexConcurrently(
+            model_name='favorite',
+            index=models.Index(fields=['recipe', 'user'], name='favorite_recipe_user_idx'),
+        ),
+        recipes.operations.AddIndexConcurrently(
+            model_name='follow',
+            index=models.Index(fields=['following', 'user'], name='follow_following_user_idx'),
+        ),
+        recipes.operations.AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-pub_date', '-id'], name='recipe_live_pub_date_idx'),
+        ),
+        recipes.operations.AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        recipes.operations.AddIndexConcurrently(
+            model_name='shoppinglist',
+            index=models.Index(fields=['recipe', 'user'], name='shoppinglist_recipe_user_idx'),
+        ),
+        recipes.operations.AddUniqueConstraintConcurrently(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), include=('amount',), name='unique_recipe_ingredient'),
+        ),
+        # Одноколоночные индексы внешних ключей - префиксы индексов выше.
+        recipes.operations.AlterFieldIndexConcurrently(
+            model_name='favorite',
+            name='recipe',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='favorites', to='recipes.recipe', verbose_name='Избранный рецепт'),
+        ),
+        recipes.operations.AlterFieldIndexConcurrently(
+            model_name='follow',
+            name='following',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='followers', to=settings.AUTH_USER_MODEL, verbose_name='Преследуемый'),
+        ),
+        recipes.operations.AlterFieldIndexConcurrently(
+            model_name='shoppinglist',
+            name='recipe',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shoppinglist', to='recipes.recipe', verbose_name='Добавленный в список покупок'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarRecipeQueue',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similar_queue', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('queued_at', models.DateTimeField(verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Рецепт в очереди на пересчёт похожих',
+                'verbose_name_plural': 'Рецепты в очереди на пересчёт похожих',
+            },
+        ),
+    ]
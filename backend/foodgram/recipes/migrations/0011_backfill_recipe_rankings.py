@@ -0,0 +1,37 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:31
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def create_missing_rankings(apps, schema_editor):
+    """
+    Пустые рейтинги для рецептов, созданных до появления RecipeRanking.
+    Без даты пересчёта их посчитает следующий запуск updaterankings.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeRanking = apps.get_model('recipes', 'RecipeRanking')
+    RecipeRanking.objects.bulk_create(
+        (
+            RecipeRanking(recipe_id=recipe_id)
+            for recipe_id in Recipe.objects.filter(
+                ranking__isnull=True
+            ).values_list('id', flat=True).iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_similarrecipequeue'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_missing_rankings, migrations.RunPython.noop
+        ),
+    ]
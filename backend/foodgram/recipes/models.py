@@ -3,6 +3,8 @@ from django.db import models
 
 from colorfield.fields import ColorField
 
+from .storage import recipe_image_storage
+
 FIELD_MAX_LENGTH = 200
 
 User = get_user_model()
@@ -49,34 +51,11 @@ class Tag(models.Model):
         return self.name
 
 
-class RecipeQuerySet(models.QuerySet):
-    def with_favorite_shopping_info(self, user):
-        if user.is_authenticated:
-            return self.annotate(
-                is_favorited=models.Exists(
-                    Favorite.objects.filter(
-                        user=user, recipe=models.OuterRef('id')
-                    )
-                ),
-                is_in_shopping_cart=models.Exists(
-                    ShoppingList.objects.filter(
-                        user=user, recipe=models.OuterRef('id')
-                    )
-                )
-            )
-
-        return self.annotate(
-            is_favorited=models.Value(False),
-            is_in_shopping_cart=models.Value(False)
-        )
-
-
 class RecipeManager(models.Manager):
-    def get_queryset(self):
-        return RecipeQuerySet(self.model, using=self._db)
+    """Рецепты, не помеченные на удаление."""
 
-    def with_favorite_shopping_info(self, user):
-        return self.get_queryset().with_favorite_shopping_info(user)
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
 
 
 class Recipe(models.Model):
@@ -94,6 +73,7 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes_images',
+        storage=recipe_image_storage,
         verbose_name='Фото'
     )
     text = models.TextField(verbose_name='Описание')
@@ -117,14 +97,17 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         db_index=True
     )
+    is_deleted = models.BooleanField(
+        default=False,
+        verbose_name='Помечен на удаление'
+    )
+    modified = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
 
     objects = RecipeManager()
 
-    def favorite_users_count(self):
-        return self.favorites.count()
-
-    favorite_users_count.short_description = 'Число добавлений в избранное'
-
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
@@ -133,9 +116,28 @@ class Recipe(models.Model):
         constraints = [
             models.UniqueConstraint(
                 fields=['author', 'name'],
+                condition=models.Q(is_deleted=False),
                 name='unique_recipe_from_author'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['modified', 'id'],
+                name='recipe_modified_idx'
+            ),
+            # Список рецептов и лента: неудалённые по дате публикации.
+            models.Index(
+                fields=['-pub_date', '-id'],
+                condition=models.Q(is_deleted=False),
+                name='recipe_live_pub_date_idx'
+            ),
+            # Страница автора: ?author= с той же сортировкой.
+            models.Index(
+                fields=['author', '-pub_date'],
+                condition=models.Q(is_deleted=False),
+                name='recipe_author_pub_date_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -158,6 +160,16 @@ class RecipeIngredient(models.Model):
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецептах'
 
+        constraints = [
+            # Покрывающий индекс: состав рецептов и сумма для списка
+            # покупок читаются без обращения к таблице.
+            models.UniqueConstraint(
+                fields=['recipe', 'ingredient'],
+                include=['amount'],
+                name='unique_recipe_ingredient'
+            )
+        ]
+
     def __str__(self):
         return f'{self.ingredient} в рецепте {self.recipe}'
 
@@ -173,7 +185,9 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='followers',
-        verbose_name='Преследуемый'
+        verbose_name='Преследуемый',
+        # Покрывается составным индексом из Meta.indexes.
+        db_index=False
     )
 
     class Meta:
@@ -186,6 +200,13 @@ class Follow(models.Model):
                 name='unique_user_following'
             )
         ]
+        indexes = [
+            # Подписчики автора и их число.
+            models.Index(
+                fields=['following', 'user'],
+                name='follow_following_user_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.user} подписан на {self.following}'
@@ -202,7 +223,13 @@ class Favorite(models.Model):
         Recipe,
         on_delete=models.CASCADE,
         related_name='favorites',
-        verbose_name='Избранный рецепт'
+        verbose_name='Избранный рецепт',
+        # Покрывается составным индексом из Meta.indexes.
+        db_index=False
+    )
+    added_date = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата добавления'
     )
 
     class Meta:
@@ -215,6 +242,13 @@ class Favorite(models.Model):
                 name='unique_favorite_recipe'
             )
         ]
+        indexes = [
+            # Число добавлений рецепта и отметки для списка рецептов.
+            models.Index(
+                fields=['recipe', 'user'],
+                name='favorite_recipe_user_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.user} добавил в избранное {self.recipe}'
@@ -231,7 +265,13 @@ class ShoppingList(models.Model):
         Recipe,
         on_delete=models.CASCADE,
         related_name='shoppinglist',
-        verbose_name='Добавленный в список покупок'
+        verbose_name='Добавленный в список покупок',
+        # Покрывается составным индексом из Meta.indexes.
+        db_index=False
+    )
+    added_date = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата добавления'
     )
 
     class Meta:
@@ -244,6 +284,174 @@ class ShoppingList(models.Model):
                 name='unique_recipe_in_shopping_list'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='shoppinglist_recipe_user_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.user} добавил в список покупок {self.recipe}'
+
+
+class RecipeTombstone(models.Model):
+    """Удалённый рецепт, о котором сообщает /api/recipes/changes/."""
+
+    recipe_id = models.BigIntegerField(verbose_name='Id рецепта')
+    deleted_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата удаления'
+    )
+
+    class Meta:
+        verbose_name = 'Удалённый рецепт'
+        verbose_name_plural = 'Удалённые рецепты'
+
+        indexes = [
+            models.Index(
+                fields=['deleted_at', 'id'],
+                name='tombstone_deleted_at_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'Рецепт {self.recipe_id} удалён'
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписчика, разложенный при публикации."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_timeline_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='timeline_user_pub_date_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class RecipeRanking(models.Model):
+    """Предрассчитанные рейтинги рецепта, см. команду updaterankings."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking',
+        verbose_name='Рецепт'
+    )
+    popular = models.FloatField(default=0, verbose_name='Популярность')
+    trending = models.FloatField(
+        default=0,
+        verbose_name='Популярность с учётом давности'
+    )
+    updated_at = models.DateTimeField(
+        null=True,
+        verbose_name='Дата пересчёта'
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+
+        indexes = [
+            models.Index(
+                fields=['-popular', '-recipe'],
+                name='ranking_popular_idx'
+            ),
+            models.Index(
+                fields=['-trending', '-recipe'],
+                name='ranking_trending_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'Рейтинг рецепта {self.recipe_id}'
+
+
+class SimilarRecipe(models.Model):
+    """Похожий рецепт по составу ингредиентов, см. команду buildsimilar."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar',
+        verbose_name='Рецепт'
+    )
+    similar_recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Степень сходства')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar_recipe'],
+                name='unique_similar_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='similar_recipe_score_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.similar_recipe} похож на {self.recipe}'
+
+
+class SimilarRecipeQueue(models.Model):
+    """
+    Рецепт с изменённым составом или тегами. Похожие рецепты для него и
+    его соседей пересчитает следующий запуск buildsimilar.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='similar_queue',
+        verbose_name='Рецепт'
+    )
+    queued_at = models.DateTimeField(verbose_name='Дата изменения')
+
+    class Meta:
+        verbose_name = 'Рецепт в очереди на пересчёт похожих'
+        verbose_name_plural = 'Рецепты в очереди на пересчёт похожих'
+
+    def __str__(self):
+        return f'Похожие на рецепт {self.recipe_id}'
@@ -0,0 +1,135 @@
+"""
+Операции миграций, которые на PostgreSQL строят индексы без блокировки
+записи в таблицу (CREATE INDEX CONCURRENTLY).
+
+Такие операции нельзя выполнять в транзакции, поэтому миграция с ними
+объявляется с atomic = False. На остальных базах операции выполняются
+как обычные AddIndex, AddConstraint и AlterField.
+"""
+from django.db import NotSupportedError, migrations
+from django.db.models import Index
+
+CREATE_UNIQUE_INDEX = 'CREATE UNIQUE INDEX'
+
+
+def use_concurrently(schema_editor, operation):
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    if schema_editor.connection.in_atomic_block:
+        raise NotSupportedError(
+            f'{type(operation).__name__} нельзя выполнять в транзакции, '
+            f'объявите миграцию с atomic = False.'
+        )
+    return True
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if not use_concurrently(schema_editor, self):
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if not use_concurrently(schema_editor, self):
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
+    def describe(self):
+        return f'{super().describe()} concurrently'
+
+
+class AddUniqueConstraintConcurrently(migrations.AddConstraint):
+    """
+    Уникальное ограничение, которое Django создаёт уникальным индексом.
+
+    Подходит для UniqueConstraint с include, condition или opclasses:
+    такие ограничения и удаляются как индекс.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if not use_concurrently(schema_editor, self):
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        statement = self.constraint.create_sql(model, schema_editor)
+        if not statement.template.startswith(CREATE_UNIQUE_INDEX):
+            raise NotSupportedError(
+                f'Ограничение {self.constraint.name} создаётся не индексом.'
+            )
+        statement.template = statement.template.replace(
+            CREATE_UNIQUE_INDEX, f'{CREATE_UNIQUE_INDEX} CONCURRENTLY', 1
+        )
+        schema_editor.execute(statement)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if not use_concurrently(schema_editor, self):
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.execute(
+                'DROP INDEX CONCURRENTLY IF EXISTS %s'
+                % schema_editor.quote_name(self.constraint.name)
+            )
+
+    def describe(self):
+        return f'{super().describe()} concurrently'
+
+
+class AlterFieldIndexConcurrently(migrations.AlterField):
+    """
+    AlterField, который меняет только db_index поля.
+
+    Одноколоночный индекс внешнего ключа удаляется или создаётся
+    CONCURRENTLY, остальные атрибуты поля в базе не меняются.
+    """
+
+    # AlterField.database_backwards вызывает database_forwards с
+    # переставленными состояниями.
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if not use_concurrently(schema_editor, self):
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        old_field = from_state.apps.get_model(
+            app_label, self.model_name
+        )._meta.get_field(self.name)
+        new_field = model._meta.get_field(self.name)
+        if old_field.db_index and not new_field.db_index:
+            for index_name in schema_editor._constraint_names(
+                model, [old_field.column], index=True, type_=Index.suffix,
+                exclude={index.name for index in model._meta.indexes}
+            ):
+                schema_editor.execute(
+                    'DROP INDEX CONCURRENTLY IF EXISTS %s'
+                    % schema_editor.quote_name(index_name)
+                )
+        elif new_field.db_index and not old_field.db_index:
+            schema_editor.execute(
+                schema_editor._create_index_sql(
+                    model, fields=[new_field], concurrently=True
+                )
+            )
+
+    def describe(self):
+        return f'{super().describe()} concurrently'
@@ -0,0 +1,132 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .feed import (
+    add_follower,
+    fanout_recipe,
+    refresh_fanout_author,
+    remove_follow
+)
+from .models import (
+    Favorite,
+    Follow,
+    Recipe,
+    RecipeIngredient,
+    RecipeRanking,
+    RecipeTombstone,
+    ShoppingList,
+    SimilarRecipe,
+    SimilarRecipeQueue
+)
+
+# Рецепты помечены на удаление одним UPDATE, без post_save. Аргумент:
+# recipe_ids.
+recipes_marked_deleted = Signal()
+
+
+@receiver(post_save, sender=Recipe)
+def fanout_new_recipe(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        transaction.on_commit(partial(fanout_recipe, instance))
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_ranking(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        RecipeRanking.objects.create(recipe=instance)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingList)
+def reset_recipe_ranking(sender, instance, **kwargs):
+    """Рейтинг рецепта пересчитает следующий запуск updaterankings."""
+    RecipeRanking.objects.filter(recipe_id=instance.recipe_id).update(
+        updated_at=None
+    )
+
+
+@receiver(post_save, sender=Follow)
+def backfill_new_follow(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        transaction.on_commit(partial(add_follower, instance))
+
+
+@receiver(post_delete, sender=Follow)
+def clear_removed_follow(sender, instance, **kwargs):
+    remove_follow(instance)
+    transaction.on_commit(
+        partial(refresh_fanout_author, instance.following_id)
+    )
+
+
+def reset_similar_recipes(recipe_ids):
+    """Похожие рецепты пересчитаются при следующем запуске buildsimilar."""
+    SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).delete()
+    now = timezone.now()
+    # Дата обновляется и у рецептов, уже стоящих в очереди: изменение во
+    # время работы buildsimilar не должно потеряться.
+    SimilarRecipeQueue.objects.bulk_create(
+        (
+            SimilarRecipeQueue(recipe_id=recipe_id, queued_at=now)
+            for recipe_id in recipe_ids
+        ),
+        ignore_conflicts=True
+    )
+    SimilarRecipeQueue.objects.filter(recipe_id__in=recipe_ids).update(
+        queued_at=now
+    )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def reset_similar_on_ingredient_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        reset_similar_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def reset_similar_on_m2m_change(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        reset_similar_recipes([instance.pk])
+    elif pk_set:
+        reset_similar_recipes(pk_set)
+
+
+def touch_recipes(recipe_ids):
+    """Отмечает изменение состава или тегов для /api/recipes/changes/."""
+    Recipe._base_manager.filter(id__in=recipe_ids).update(
+        modified=timezone.now()
+    )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def touch_on_ingredient_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        touch_recipes([instance.pk])
+    elif pk_set:
+        touch_recipes(pk_set)
+
+
+@receiver(post_delete, sender=Recipe)
+def add_recipe_tombstone(sender, instance, **kwargs):
+    # Для помеченных на удаление рецептов запись уже создана при пометке.
+    if not instance.is_deleted:
+        RecipeTombstone.objects.create(recipe_id=instance.pk)
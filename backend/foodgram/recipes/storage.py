@@ -0,0 +1,68 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла - хеш его содержимого.
+
+    Файл сохраняется как <каталог>/<первые два символа хеша>/<хеш>.<расш.>,
+    одинаковые изображения хранятся один раз, а содержимое по одному URL
+    никогда не меняется, поэтому его можно кешировать без ограничения срока.
+    """
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+
+        extension = posixpath.splitext(name)[1].lower()
+        name = posixpath.join(
+            posixpath.dirname(name), digest[:2], digest + extension
+        )
+        if self.exists(name):
+            # Файл снова используется: обновлённая дата изменения
+            # защищает его от удаления в delete_unused_files.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+    def restore(self, name, content):
+        """Сохраняет файл из выгрузки под исходным именем, если его нет."""
+        if not self.exists(name):
+            super().save(name, content)
+
+    def delete_unused_files(self, directory, get_used, older_than):
+        """
+        Удаляет из directory файлы, на которые ничего не ссылается.
+
+        get_used(prefix) возвращает используемые имена с этим префиксом.
+        Файлы новее older_than не удаляются: рецепт с только что
+        загруженным или повторно загруженным изображением может быть ещё
+        не сохранён. Возвращает число удалённых файлов.
+        """
+        deleted = 0
+        if not self.exists(directory):
+            return deleted
+        subdirectories, _ = self.listdir(directory)
+        for subdirectory in subdirectories:
+            prefix = posixpath.join(directory, subdirectory)
+            used = get_used(f'{prefix}/')
+            for file in self.listdir(prefix)[1]:
+                name = posixpath.join(prefix, file)
+                if (
+                    name not in used
+                    and self.get_modified_time(name) < older_than
+                ):
+                    self.delete(name)
+                    deleted += 1
+        return deleted
+
+
+recipe_image_storage = ContentAddressedStorage()
@@ -0,0 +1,54 @@
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag, User
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(
+        email='user@foodgram.ru', username='user', password='pass12345QQ',
+        first_name='Иван', last_name='Иванов'
+    )
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    token = Token.objects.create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def authors():
+    return [
+        User.objects.create_user(
+            email=f'author{index}@foodgram.ru', username=f'author{index}',
+            password='pass12345QQ', first_name='Автор', last_name=str(index)
+        )
+        for index in range(7)
+    ]
+
+
+@pytest.fixture
+def recipes(authors):
+    tag = Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+    ingredient = Ingredient.objects.create(
+        name='Яйцо', measurement_unit='шт'
+    )
+    recipes = []
+    for author in authors:
+        for index in range(3):
+            recipe = Recipe.objects.create(
+                author=author, name=f'{author.username} {index}',
+                image='recipes_images/test.png', text='Описание',
+                cooking_time=10
+            )
+            recipe.tags.add(tag)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=2
+            )
+            recipes.append(recipe)
+    return recipes
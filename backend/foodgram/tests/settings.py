@@ -0,0 +1,25 @@
+"""Настройки тестов: основная база и реплика в SQLite."""
+from foodgram.settings import *  # noqa: F401, F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test.sqlite3',  # noqa: F405
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test_replica.sqlite3',  # noqa: F405
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Поиск N+1 запросов с ошибкой при превышении бюджета, см.
+# foodgram/pytest_plugin.py.
+QUERY_COUNT_CHECK = True
+QUERY_BUDGET_RAISE = True
+if 'foodgram.querycount.QueryCountMiddleware' not in MIDDLEWARE:  # noqa: F405
+    MIDDLEWARE.insert(  # noqa: F405
+        0, 'foodgram.querycount.QueryCountMiddleware'
+    )
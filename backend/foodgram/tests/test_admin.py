@@ -0,0 +1,133 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+
+from recipes import admin as recipes_admin
+from recipes.admin import EstimatedCountPaginator
+from recipes.models import Favorite, Ingredient, Recipe, User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def admin_client(client):
+    admin = User.objects.create_superuser(
+        email='admin@foodgram.ru', username='admin', password='pass12345QQ'
+    )
+    client.force_login(admin)
+    return client
+
+
+def get_changelist(admin_client, params=None):
+    with CaptureQueriesContext(connection) as queries:
+        response = admin_client.get('/admin/recipes/recipe/', params)
+    assert response.status_code == 200
+    return response, len(queries)
+
+
+def test_recipe_changelist(admin_client, recipes, authors):
+    Favorite.objects.create(user=authors[1], recipe=recipes[0])
+
+    response, _ = get_changelist(admin_client)
+
+    changelist = response.context['cl']
+    assert isinstance(changelist.paginator, EstimatedCountPaginator)
+    assert changelist.paginator.relation == 'recipe_live_pub_date_idx'
+    assert changelist.result_count == len(recipes)
+    favorites = {
+        recipe.id: recipe.favorites_count
+        for recipe in changelist.result_list
+    }
+    assert favorites[recipes[0].id] == 1
+    assert favorites[recipes[1].id] == 0
+
+
+def test_recipe_changelist_queries_do_not_grow(admin_client, recipes):
+    _, before = get_changelist(admin_client)
+    for recipe in recipes:
+        recipe.pk = None
+        recipe.name = f'{recipe.name} копия'
+        recipe.save()
+
+    _, after = get_changelist(admin_client)
+
+    assert after == before
+
+
+def test_recipe_change_page_does_not_list_ingredients(
+    admin_client, recipes
+):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'Специя {index}', measurement_unit='г')
+        for index in range(50)
+    )
+
+    response = admin_client.get(
+        f'/admin/recipes/recipe/{recipes[0].id}/change/'
+    )
+
+    assert response.status_code == 200
+    content = response.content.decode()
+    assert 'Яйцо' in content
+    assert 'Специя' not in content
+
+
+class FakeCursor:
+
+    def __init__(self, executed):
+        self.executed = executed
+
+    def execute(self, sql, params):
+        self.executed.append(params)
+
+    def fetchone(self):
+        return (50000.0,)
+
+
+class FakeConnection:
+    vendor = 'postgresql'
+
+    def __init__(self):
+        self.executed = []
+
+    @contextmanager
+    def cursor(self):
+        yield FakeCursor(self.executed)
+
+
+@pytest.mark.parametrize('filtered, expected', [(False, 50000), (True, 1)])
+def test_count_is_estimated_for_unfiltered_list(
+    monkeypatch, recipes, filtered, expected
+):
+    fake = FakeConnection()
+    monkeypatch.setattr(
+        recipes_admin, 'connections', {'default': fake}
+    )
+    queryset = Recipe.objects.all()
+    if filtered:
+        queryset = queryset.filter(name=recipes[0].name)
+
+    paginator = EstimatedCountPaginator(
+        queryset, 100, relation='recipe_live_pub_date_idx'
+    )
+
+    assert paginator.count == expected
+    assert fake.executed == (
+        [] if filtered else [['recipe_live_pub_date_idx']]
+    )
+
+
+def test_mark_deleted_action(admin_client, recipes):
+    response = admin_client.post('/admin/recipes/recipe/', {
+        'action': 'mark_deleted',
+        '_selected_action': [recipes[0].id, recipes[1].id],
+    })
+
+    assert response.status_code == 302
+    assert not Recipe.objects.filter(
+        id__in=[recipes[0].id, recipes[1].id]
+    ).exists()
+    assert Recipe.objects.count() == len(recipes) - 2
@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from django.http import HttpResponse
+from django.urls import path
+
+import pytest
+
+from api.async_views import async_read_view
+from foodgram.asgi import application
+
+DELAY = 0.3
+
+
+def slow_view(request):
+    time.sleep(DELAY)
+    return HttpResponse('ok')
+
+
+urlpatterns = [path('slow/', async_read_view(slow_view))]
+
+
+def make_scope(path, query_string=b'', headers=()):
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query_string,
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), *headers],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 50000),
+    }
+
+
+async def request(path, query_string=b'', headers=()):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(
+        make_scope(path, query_string, headers), receive, send
+    )
+    return messages
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+def test_concurrent_reads_overlap(settings):
+    settings.ROOT_URLCONF = __name__
+
+    async def run():
+        return await asyncio.gather(*(request('/slow/') for _ in range(4)))
+
+    started = time.perf_counter()
+    responses = asyncio.run(run())
+    elapsed = time.perf_counter() - started
+
+    assert [messages[0]['status'] for messages in responses] == [200] * 4
+    assert elapsed < DELAY * 2
@@ -0,0 +1,62 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+
+import orjson
+import pytest
+
+from api.backup import export_recipes, import_recipes
+from recipes.models import Recipe
+from recipes.storage import recipe_image_storage
+
+pytestmark = pytest.mark.django_db
+
+
+def report(kind, count, elapsed):
+    pass
+
+
+@pytest.fixture
+def image(settings, tmp_path, recipes):
+    settings.MEDIA_ROOT = str(tmp_path)
+    name = recipe_image_storage.save(
+        'recipes_images/test.png', ContentFile(b'png')
+    )
+    Recipe.objects.update(image=name)
+    return name
+
+
+def export(**kwargs):
+    stream = BytesIO()
+    export_recipes(stream, report, **kwargs)
+    return stream.getvalue()
+
+
+def test_export_without_media_has_no_images(image):
+    records = [orjson.loads(line) for line in export().splitlines()]
+
+    assert 'image' not in {record['type'] for record in records}
+
+
+def test_images_are_restored_from_export(image):
+    data = export(with_media=True)
+    images = [
+        record for record in map(orjson.loads, data.splitlines())
+        if record['type'] == 'image'
+    ]
+    assert [record['name'] for record in images] == [image]
+    recipe_image_storage.delete(image)
+
+    import_recipes(BytesIO(data), 100, report)
+
+    with recipe_image_storage.open(image) as file:
+        assert file.read() == b'png'
+
+
+def test_image_outside_upload_dir_is_rejected(image):
+    line = orjson.dumps(
+        {'type': 'image', 'name': 'catalog/evil.json', 'content': ''}
+    )
+
+    with pytest.raises(ValueError):
+        import_recipes(BytesIO(line), 100, report)
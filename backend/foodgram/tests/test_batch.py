@@ -0,0 +1,63 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+
+from recipes.deletion import mark_recipes_deleted
+from recipes.models import Favorite, Recipe
+
+pytestmark = pytest.mark.django_db
+
+URL = '/api/recipes/batch/'
+
+
+def get_batch(client, ids):
+    response = client.get(URL, {'ids': ','.join(map(str, ids))})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_order_missing_and_repeated_ids(client, recipes):
+    first, second = recipes[2].id, recipes[0].id
+    missing = max(recipe.id for recipe in recipes) + 1
+
+    data = get_batch(client, [first, missing, second, first])
+
+    assert [item and item['id'] for item in data] == [
+        first, None, second, first
+    ]
+    assert data[1] is None
+
+
+def test_deleted_recipe_is_null(client, recipes):
+    mark_recipes_deleted(Recipe.objects.filter(id=recipes[0].id))
+
+    assert get_batch(client, [recipes[0].id, recipes[1].id])[0] is None
+
+
+def test_user_flags(user_client, user, recipes):
+    Favorite.objects.create(user=user, recipe=recipes[1])
+
+    data = get_batch(user_client, [recipes[0].id, recipes[1].id])
+
+    assert [item['is_favorited'] for item in data] == [False, True]
+
+
+def test_query_count_does_not_depend_on_ids(user_client, recipes):
+    queries = []
+    for count in (2, 20):
+        with CaptureQueriesContext(connection) as captured:
+            assert len(get_batch(
+                user_client, [recipe.id for recipe in recipes[:count]]
+            )) == count
+        queries.append(len(captured))
+
+    assert queries[0] == queries[1]
+
+
+@pytest.mark.parametrize('ids', ['', 'a,b', ','.join(['1'] * 101)])
+def test_invalid_ids(client, ids):
+    response = client.get(URL, {'ids': ids})
+
+    assert response.status_code == 400
+    assert 'ids' in response.json()
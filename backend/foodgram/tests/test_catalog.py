@@ -0,0 +1,145 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+import pytest
+
+from api import catalog
+from api.signals import on_commit_once
+from recipes.models import Ingredient
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path, monkeypatch):
+    settings.MEDIA_ROOT = str(tmp_path)
+    monkeypatch.setattr(catalog, '_local_snapshot', {})
+    return tmp_path
+
+
+def catalog_files(media_root):
+    return sorted(os.listdir(media_root / catalog.CATALOG_DIR))
+
+
+def test_concurrent_builds_leave_one_copy(media_root, monkeypatch):
+    Ingredient.objects.create(name='Соль', measurement_unit='г')
+    # Обе сборки успели проверить, что файла ещё нет.
+    monkeypatch.setattr(default_storage, 'exists', lambda name: False)
+
+    first = catalog.build_catalog_snapshot()
+    second = catalog.build_catalog_snapshot()
+
+    assert first == second
+    name = os.path.basename(first['name'])
+    assert catalog_files(media_root) == ['current.json', name, f'{name}.gz']
+
+
+def test_old_versions_and_leftovers_are_deleted(media_root):
+    directory = media_root / catalog.CATALOG_DIR
+    directory.mkdir()
+    for file in (
+        'ingredients.0123456789abcdef.json',
+        'ingredients.0123456789abcdef.json.gz',
+        'ingredients.0123456789abcdef_AbCdEfG.json',
+        'ingredients.0123456789abcdef.json_AbCdEfG.gz',
+        '.tmp-old',
+        '.tmp-fresh',
+    ):
+        (directory / file).write_bytes(b'[]')
+    for file in ('.tmp-old', 'ingredients.0123456789abcdef.json'):
+        os.utime(directory / file, (0, 0))
+    versions = []
+    for name in ('Соль', 'Сахар', 'Мука'):
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        versions.append(catalog.build_catalog_snapshot()['name'])
+
+    kept = [os.path.basename(name) for name in versions[-2:]]
+    assert catalog_files(media_root) == sorted([
+        '.tmp-fresh', 'current.json', *kept,
+        *(f'{name}.gz' for name in kept)
+    ])
+
+
+def test_snapshot_is_not_rebuilt_without_shared_cache(
+    monkeypatch, django_assert_num_queries
+):
+    Ingredient.objects.create(name='Соль', measurement_unit='г')
+    builds = []
+    build = catalog.build_catalog_snapshot
+
+    def record():
+        builds.append(1)
+        return build()
+
+    monkeypatch.setattr(catalog, 'build_catalog_snapshot', record)
+    snapshot = catalog.get_catalog_snapshot()
+
+    with django_assert_num_queries(0):
+        for _ in range(3):
+            assert catalog.get_catalog_snapshot() == snapshot
+    assert builds == [1]
+
+
+def test_snapshot_built_by_another_process_is_read(
+    django_capture_on_commit_callbacks
+):
+    Ingredient.objects.create(name='Соль', measurement_unit='г')
+    old = catalog.get_catalog_snapshot()
+
+    # Сигнал пересобирает снимок, как это сделал бы другой воркер.
+    with django_capture_on_commit_callbacks(execute=True):
+        Ingredient.objects.create(name='Сахар', measurement_unit='г')
+    new = catalog.get_catalog_snapshot()
+
+    assert new != old
+    assert new == catalog.build_catalog_snapshot()
+
+
+def test_version_endpoint(client):
+    Ingredient.objects.create(name='Соль', measurement_unit='г')
+
+    response = client.get('/api/ingredients/version/')
+
+    snapshot = catalog.get_catalog_snapshot()
+    assert response.json() == {
+        'version': snapshot['version'],
+        'url': f'http://testserver/media/{snapshot["name"]}',
+    }
+
+
+def test_on_commit_once_runs_once_per_transaction(
+    django_capture_on_commit_callbacks
+):
+    calls = []
+
+    def callback():
+        calls.append(1)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        for _ in range(3):
+            on_commit_once(callback)
+    assert calls == [1]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        on_commit_once(callback)
+    assert calls == [1, 1]
+
+
+def test_on_commit_once_after_rollback(django_capture_on_commit_callbacks):
+    calls = []
+
+    def callback():
+        calls.append(1)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        try:
+            with transaction.atomic():
+                on_commit_once(callback)
+                raise ValueError
+        except ValueError:
+            pass
+        on_commit_once(callback)
+
+    assert calls == [1]
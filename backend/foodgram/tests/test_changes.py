@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+import pytest
+
+from recipes.changes import dump_cursor
+from recipes.deletion import mark_recipes_deleted
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+pytestmark = pytest.mark.django_db
+
+URL = '/api/recipes/changes/'
+
+
+@pytest.fixture(autouse=True)
+def no_lag(settings):
+    settings.RECIPE_CHANGES_LAG_SECONDS = 0
+
+
+def sync(client, token=None):
+    response = client.get(URL, {'since': token} if token else {})
+    assert response.status_code == 200
+    return response.json()
+
+
+def sync_all(client, token=None):
+    """Все страницы изменений: id рецептов, удалённые id и новый токен."""
+    recipe_ids, deleted = [], []
+    while True:
+        data = sync(client, token)
+        recipe_ids += [recipe['id'] for recipe in data['recipes']]
+        deleted += data['deleted']
+        token = data['next']
+        if not data['has_more']:
+            return recipe_ids, deleted, token
+
+
+def test_first_sync_is_paginated(client, recipes, settings):
+    settings.RECIPE_CHANGES_PAGE_SIZE = 5
+
+    recipe_ids, deleted, _ = sync_all(client)
+
+    assert sorted(recipe_ids) == sorted(recipe.id for recipe in recipes)
+    assert deleted == []
+
+
+def test_changes_since_token(client, recipes):
+    *_, token = sync_all(client)
+    assert sync_all(client, token)[:2] == ([], [])
+
+    salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+    RecipeIngredient.objects.create(
+        recipe=recipes[0], ingredient=salt, amount=1
+    )
+    recipes[1].tags.clear()
+    mark_recipes_deleted(Recipe.objects.filter(id=recipes[2].id))
+
+    recipe_ids, deleted, _ = sync_all(client, token)
+    assert sorted(recipe_ids) == [recipes[0].id, recipes[1].id]
+    assert deleted == [recipes[2].id]
+
+
+def test_changes_within_lag_are_postponed(client, recipes, settings):
+    settings.RECIPE_CHANGES_LAG_SECONDS = 60
+    Recipe.objects.exclude(id=recipes[0].id).update(
+        modified=timezone.now() - timedelta(seconds=120)
+    )
+
+    recipe_ids, *_ = sync_all(client)
+
+    assert sorted(recipe_ids) == sorted(
+        recipe.id for recipe in recipes[1:]
+    )
+
+
+def test_invalid_token(client):
+    response = client.get(URL, {'since': 'broken'})
+
+    assert response.status_code == 400
+    assert 'since' in response.json()
+
+
+def test_expired_token(client, settings):
+    moment = timezone.now() - timedelta(
+        days=settings.RECIPE_TOMBSTONE_DAYS + 1
+    )
+    token = dump_cursor((moment, None), (moment, None))
+
+    response = client.get(URL, {'since': token})
+
+    assert response.status_code == 410
@@ -0,0 +1,100 @@
+from django.core.cache import cache
+from django.db import OperationalError, connections, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+from rest_framework.authtoken.models import Token
+
+from foodgram import db_router
+from foodgram.db_router import ReplicaRoutingMiddleware
+from recipes.models import Recipe
+
+# Реплика в тестах - зеркало основной базы, поэтому тесты работают вне
+# транзакции: внутри неё чтение уходит в основную базу.
+pytestmark = pytest.mark.django_db(
+    transaction=True, databases=['default', 'replica']
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    yield
+    db_router._unhealthy_until.clear()
+    cache.clear()
+
+
+def handle(method='get', path='/api/recipes/', status=200, **headers):
+    """Базы, выбранные роутером во время обработки запроса."""
+    routes = {}
+
+    def view(request):
+        routes['read'] = router.db_for_read(Recipe)
+        routes['write'] = router.db_for_write(Recipe)
+        routes['token'] = router.db_for_read(Token)
+        with transaction.atomic():
+            routes['atomic_read'] = router.db_for_read(Recipe)
+        return HttpResponse(status=status)
+
+    request = getattr(RequestFactory(), method)(path, **headers)
+    ReplicaRoutingMiddleware(view)(request)
+    return routes
+
+
+def test_safe_api_reads_go_to_replica():
+    routes = handle()
+
+    assert routes['read'] == 'replica'
+    assert routes['write'] == 'default'
+    assert routes['token'] == 'default'
+
+
+def test_reads_inside_atomic_go_to_primary():
+    assert handle()['atomic_read'] == 'default'
+
+
+@pytest.mark.parametrize('method, path', [
+    ('post', '/api/recipes/'),
+    ('get', '/admin/recipes/recipe/'),
+])
+def test_writes_and_other_paths_use_primary(method, path):
+    assert handle(method, path)['read'] == 'default'
+
+
+def test_client_reads_primary_after_write():
+    handle('post', status=201, HTTP_AUTHORIZATION='Token writer')
+
+    assert handle(HTTP_AUTHORIZATION='Token writer')['read'] == 'default'
+    assert handle(HTTP_AUTHORIZATION='Token reader')['read'] == 'replica'
+
+
+def test_failed_write_does_not_pin_client():
+    handle('post', status=400, HTTP_AUTHORIZATION='Token writer')
+
+    assert handle(HTTP_AUTHORIZATION='Token writer')['read'] == 'replica'
+
+
+def test_unavailable_replica_falls_back_to_primary(monkeypatch):
+    attempts = []
+
+    def ensure_connection():
+        attempts.append(1)
+        raise OperationalError('replica is down')
+
+    replica = connections['replica']
+    monkeypatch.setattr(replica, 'ensure_connection', ensure_connection)
+
+    assert handle()['read'] == 'default'
+    assert handle()['read'] == 'default'
+    # Недоступная реплика не проверяется до DB_REPLICA_RETRY_SECONDS.
+    assert len(attempts) == 1
+
+
+def test_api_reads_committed_rows_through_replica(client, recipes):
+    with CaptureQueriesContext(connections['replica']) as queries:
+        response = client.get('/api/recipes/')
+
+    assert response.status_code == 200
+    assert response.json()['count'] == len(recipes)
+    assert len(queries) > 0
@@ -0,0 +1,81 @@
+from django.contrib.admin.sites import site
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+
+from api import signals
+from recipes.admin import EstimatedCountPaginator
+from recipes.deletion import mark_recipes_deleted, mark_users_deleted
+from recipes.models import Recipe, RecipeTombstone, User
+
+pytestmark = pytest.mark.django_db
+
+
+def test_recipes_are_marked_deleted_in_bulk(
+    recipes, monkeypatch, django_capture_on_commit_callbacks
+):
+    invalidated = []
+    monkeypatch.setattr(signals, 'invalidate_recipes', invalidated.extend)
+    recipe_ids = [recipe.id for recipe in recipes]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        with CaptureQueriesContext(connection) as queries:
+            mark_recipes_deleted(Recipe.objects.all())
+
+    assert len(queries) <= 6
+    assert not Recipe.objects.exists()
+    assert sorted(
+        RecipeTombstone.objects.values_list('recipe_id', flat=True)
+    ) == sorted(recipe_ids)
+    assert sorted(invalidated) == sorted(recipe_ids)
+
+
+def test_deleted_user_frees_email_and_username(user):
+    mark_users_deleted(User.objects.filter(id=user.id))
+    user.refresh_from_db()
+
+    assert user.is_deleted and not user.is_active
+    assert user.username == f'deleted:{user.id}'
+    assert user.email == f'deleted:{user.id}@deleted.invalid'
+    User.objects.create_user(
+        email='user@foodgram.ru', username='user', password='pass12345QQ'
+    )
+
+
+def test_deleted_names_can_not_be_registered(client, authors):
+    user_id = authors[0].id
+    User.objects.create_user(
+        email=f'deleted-{user_id}@deleted.invalid',
+        username=f'deleted-{user_id}', password='pass12345QQ'
+    )
+
+    mark_users_deleted(User.objects.filter(id=user_id))
+
+    response = client.post('/api/users/', {
+        'email': f'deleted:{user_id}@deleted.invalid',
+        'username': f'deleted:{user_id}',
+        'first_name': 'Иван', 'last_name': 'Иванов',
+        'password': 'pass12345QQ',
+    })
+    assert response.status_code == 400
+    assert set(response.json()) == {'email', 'username'}
+
+
+@pytest.mark.parametrize('relation, filtered, expected', [
+    ('recipe_live_pub_date_idx', False, True),
+    ('recipe_live_pub_date_idx', True, False),
+    (None, False, False),
+])
+def test_recipe_count_estimate_uses_partial_index(
+    rf, user, relation, filtered, expected
+):
+    request = rf.get('/admin/recipes/recipe/')
+    request.user = user
+    queryset = site._registry[Recipe].get_queryset(request)
+    if filtered:
+        queryset = queryset.filter(name='Суп')
+
+    paginator = EstimatedCountPaginator(queryset, 100, relation=relation)
+
+    assert paginator.is_unfiltered(queryset.query) is expected
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+import pytest
+
+from api.events import (
+    get_active_user_id,
+    get_last_event_position,
+    get_new_recipes,
+    issue_ticket,
+    load_ticket
+)
+from recipes.models import Recipe
+
+pytestmark = pytest.mark.django_db
+
+
+def test_ticket_identifies_user(user):
+    assert load_ticket(issue_ticket(user.id)) == user.id
+    assert load_ticket('forged') is None
+
+
+def test_ticket_expires(user, settings):
+    ticket = issue_ticket(user.id)
+    settings.EVENTS_TICKET_MAX_AGE = -1
+
+    assert load_ticket(ticket) is None
+
+
+def test_ticket_of_deleted_user_is_rejected(user):
+    user.is_deleted = True
+    user.save()
+
+    assert get_active_user_id(user.id) is None
+
+
+def test_user_gets_ticket(user_client, user):
+    response = user_client.post('/api/recipes/events/ticket/')
+
+    assert response.status_code == 200
+    assert load_ticket(response.json()['ticket']) == user.id
+
+
+def test_last_event_id_is_recipe_position():
+    moment = timezone.now()
+    scope = {'headers': [
+        (b'last-event-id', f'{moment.isoformat()},42'.encode())
+    ]}
+
+    assert get_last_event_position(scope) == (moment, 42)
+    assert get_last_event_position({'headers': [
+        (b'last-event-id', b'42')
+    ]}) is None
+
+
+def test_new_recipes_wait_for_commit_lag(recipes, settings):
+    settings.RECIPE_CHANGES_LAG_SECONDS = 10
+    now = timezone.now()
+    last, previous, *_ = reversed(recipes)
+    # Рецепт с меньшим id опубликован позже: его транзакция ещё могла
+    # не зафиксироваться к первому опросу.
+    Recipe.objects.filter(id=last.id).update(
+        pub_date=now - timedelta(seconds=30)
+    )
+    position = (now - timedelta(seconds=60), None)
+
+    first_page, position, _ = get_new_recipes(position)
+    assert [recipe.id for recipe in first_page] == [last.id]
+
+    settings.RECIPE_CHANGES_LAG_SECONDS = 0
+    second_page, _, _ = get_new_recipes(position)
+    assert previous.id in [recipe.id for recipe in second_page]
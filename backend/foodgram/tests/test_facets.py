@@ -0,0 +1,119 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+
+from api import cache as recipe_cache
+from recipes.models import Favorite, Tag
+
+pytestmark = pytest.mark.django_db
+
+URL = '/api/recipes/'
+
+
+@pytest.fixture
+def lunch(recipes):
+    tag = Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+    for recipe in recipes[:4]:
+        recipe.tags.add(tag)
+    return tag
+
+
+@pytest.fixture
+def shared_cache(settings):
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'default',
+        },
+        'recipes': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'recipes',
+        },
+    }
+    recipe_cache.cache.clear()
+    yield
+    recipe_cache.cache.clear()
+
+
+def get_facets(client, params):
+    response = client.get(URL, params)
+    assert response.status_code == 200
+    return response.json()['facets']
+
+
+def test_facet_counts(client, recipes, authors, lunch):
+    facets = get_facets(client, {'facets': 'tags,author'})
+
+    assert facets['tags'] == [
+        {'slug': 'breakfast', 'name': 'Завтрак', 'count': len(recipes)},
+        {'slug': 'lunch', 'name': 'Обед', 'count': 4},
+    ]
+    assert facets['author'][0] == {
+        'id': authors[0].id, 'username': authors[0].username, 'count': 3
+    }
+    assert sum(item['count'] for item in facets['author']) == len(recipes)
+
+
+def test_facets_follow_filter(client, authors, lunch):
+    facets = get_facets(
+        client, {'facets': 'tags', 'author': authors[1].id}
+    )
+
+    assert facets['tags'] == [
+        {'slug': 'breakfast', 'name': 'Завтрак', 'count': 3},
+        {'slug': 'lunch', 'name': 'Обед', 'count': 1},
+    ]
+
+
+def test_facets_limit(client, recipes, settings):
+    settings.RECIPE_FACETS_LIMIT = 2
+
+    assert len(get_facets(client, {'facets': 'author'})['author']) == 2
+
+
+def count_queries(client, params):
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get(URL, params).status_code == 200
+    return len(queries)
+
+
+def test_one_query_per_facet(client, recipes, lunch):
+    without = count_queries(client, {})
+
+    assert count_queries(client, {'facets': 'tags,author'}) == without + 2
+
+
+def test_unknown_facet(client):
+    response = client.get(URL, {'facets': 'tags,color'})
+
+    assert response.status_code == 400
+    assert 'facets' in response.json()
+
+
+def test_common_filters_are_cached(client, recipes, lunch, shared_cache):
+    params = {'facets': 'tags', 'tags': ['lunch', 'breakfast']}
+    before = get_facets(client, params)
+    lunch.recipes.clear()
+
+    assert get_facets(client, params) == before
+    assert get_facets(
+        client, {'facets': 'tags', 'tags': ['breakfast', 'lunch']}
+    ) == before
+
+
+def test_user_filters_are_not_cached(
+    user_client, user, recipes, shared_cache
+):
+    params = {'facets': 'author', 'is_favorited': 1}
+    assert get_facets(user_client, params) == {'author': []}
+
+    Favorite.objects.create(user=user, recipe=recipes[0])
+
+    assert get_facets(user_client, params)['author'] == [
+        {
+            'id': recipes[0].author_id,
+            'username': recipes[0].author.username,
+            'count': 1,
+        }
+    ]
@@ -0,0 +1,97 @@
+from django.core.cache import cache
+
+import pytest
+
+from recipes.deletion import mark_users_deleted, process_deletions
+from recipes.feed import get_feed_queryset
+from recipes.models import Follow, Recipe, TimelineEntry, User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def fanout_limit(settings):
+    settings.FEED_FANOUT_MAX_FOLLOWERS = 2
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def author(authors, user, django_capture_on_commit_callbacks):
+    author = authors[0]
+    with django_capture_on_commit_callbacks(execute=True):
+        for follower in [user, *authors[1:3]]:
+            Follow.objects.create(user=follower, following=author)
+    return author
+
+
+def publish(author, name, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        return Recipe.objects.create(
+            author=author, name=name, image='recipes_images/test.png',
+            text='Описание', cooking_time=10
+        )
+
+
+def get_feed(user):
+    return set(
+        get_feed_queryset(user, Recipe.objects.all()).values_list(
+            'id', flat=True
+        )
+    )
+
+
+def test_popular_author_is_read_directly(
+    author, user, django_capture_on_commit_callbacks
+):
+    recipe = publish(author, 'Пирог', django_capture_on_commit_callbacks)
+
+    assert not TimelineEntry.objects.filter(recipe=recipe).exists()
+    assert get_feed(user) == {recipe.id}
+
+
+def test_unfollow_below_limit_fills_timelines(
+    author, authors, user, django_capture_on_commit_callbacks
+):
+    recipe = publish(author, 'Пирог', django_capture_on_commit_callbacks)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Follow.objects.get(user=authors[2], following=author).delete()
+
+    assert set(
+        TimelineEntry.objects.filter(recipe=recipe).values_list(
+            'user_id', flat=True
+        )
+    ) == {user.id, authors[1].id}
+    assert get_feed(user) == {recipe.id}
+    assert get_feed(authors[2]) == set()
+
+
+def test_purged_follower_below_limit_fills_timelines(
+    author, authors, user, django_capture_on_commit_callbacks
+):
+    recipe = publish(author, 'Пирог', django_capture_on_commit_callbacks)
+
+    mark_users_deleted(User.objects.filter(id=authors[2].id))
+    process_deletions(100, lambda model, count: None)
+
+    assert TimelineEntry.objects.filter(user=user, recipe=recipe).exists()
+    assert get_feed(user) == {recipe.id}
+
+
+def test_follow_above_limit_switches_to_direct_reads(
+    authors, user, django_capture_on_commit_callbacks
+):
+    author = authors[0]
+    with django_capture_on_commit_callbacks(execute=True):
+        for follower in authors[1:3]:
+            Follow.objects.create(user=follower, following=author)
+    publish(author, 'Суп', django_capture_on_commit_callbacks)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Follow.objects.create(user=user, following=author)
+    recipe = publish(author, 'Пирог', django_capture_on_commit_callbacks)
+
+    assert not TimelineEntry.objects.filter(recipe=recipe).exists()
+    assert recipe.id in get_feed(user)
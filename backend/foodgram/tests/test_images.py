@@ -0,0 +1,56 @@
+import os
+import time
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.utils import timezone
+
+import pytest
+
+from recipes.models import Recipe
+from recipes.storage import recipe_image_storage
+
+pytestmark = pytest.mark.django_db
+
+DAY = 60 * 60 * 24
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+
+
+def save_image(content, age=0):
+    name = recipe_image_storage.save(
+        'recipes_images/image.png', ContentFile(content)
+    )
+    modified = time.time() - age
+    os.utime(recipe_image_storage.path(name), (modified, modified))
+    return name
+
+
+def test_unused_images_are_deleted_after_grace_period(recipes):
+    used = save_image(b'used', age=2 * DAY)
+    Recipe.objects.filter(id=recipes[0].id).update(image=used)
+    unused = save_image(b'unused', age=2 * DAY)
+    fresh = save_image(b'fresh')
+
+    call_command('deleteunusedimages', '--grace-hours', '24')
+
+    assert recipe_image_storage.exists(used)
+    assert not recipe_image_storage.exists(unused)
+    assert recipe_image_storage.exists(fresh)
+
+
+def test_saving_same_content_protects_old_file():
+    name = save_image(b'image', age=2 * DAY)
+
+    assert recipe_image_storage.save(
+        'recipes_images/copy.png', ContentFile(b'image')
+    ) == name
+    recipe_image_storage.delete_unused_files(
+        'recipes_images', lambda prefix: set(),
+        timezone.now() - timedelta(hours=24)
+    )
+    assert recipe_image_storage.exists(name)
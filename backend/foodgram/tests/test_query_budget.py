@@ -0,0 +1,61 @@
+import pytest
+
+from foodgram.querycount import QueryBudgetExceeded
+from recipes.models import Follow, Tag
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def subscriptions(user, authors, recipes):
+    Follow.objects.bulk_create(
+        Follow(user=user, following=author) for author in authors
+    )
+
+
+@pytest.mark.query_budget(10)
+def test_recipe_list(user_client, recipes):
+    response = user_client.get('/api/recipes/')
+
+    assert response.status_code == 200
+    assert response.data['count'] == len(recipes)
+    assert int(response['X-Query-Count']) <= 10
+
+
+@pytest.mark.query_budget(10)
+def test_subscriptions(user_client, authors, subscriptions):
+    response = user_client.get('/api/users/subscriptions/?recipes_limit=2')
+
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert len(results) == len(authors)
+    assert all(author['is_subscribed'] for author in results)
+    assert all(author['recipes_count'] == 3 for author in results)
+    assert all(len(author['recipes']) == 2 for author in results)
+
+
+def test_users(user_client, authors, subscriptions, query_budget):
+    with query_budget(10):
+        response = user_client.get('/api/users/?limit=20')
+
+    assert response.status_code == 200
+    subscribed = {
+        item['username']: item['is_subscribed']
+        for item in response.json()['results']
+    }
+    assert subscribed.pop('user') is False
+    assert all(subscribed.values())
+
+
+def test_repeated_queries_fail_test(query_budget):
+    with pytest.raises(pytest.fail.Exception, match='повторён 3 раз'):
+        with query_budget(100, threshold=3):
+            for tag_id in range(3):
+                list(Tag.objects.filter(id=tag_id))
+
+
+def test_middleware_raises_over_budget(user_client, recipes, settings):
+    settings.QUERY_BUDGETS = {'recipe-list': 1}
+
+    with pytest.raises(QueryBudgetExceeded):
+        user_client.get('/api/recipes/')
@@ -0,0 +1,111 @@
+from datetime import timedelta
+from io import StringIO
+
+from importlib import import_module
+
+from django.apps import apps
+from django.core.management import call_command
+from django.utils import timezone
+
+import pytest
+
+from recipes.deletion import mark_users_deleted, process_deletions
+from recipes.models import Favorite, RecipeRanking, ShoppingList, User
+
+pytestmark = pytest.mark.django_db
+
+
+def update_rankings(*args):
+    call_command('updaterankings', *args, stdout=StringIO())
+    return {
+        ranking.recipe_id: ranking
+        for ranking in RecipeRanking.objects.all()
+    }
+
+
+def add_events(recipe, users):
+    for user in users:
+        Favorite.objects.create(user=user, recipe=recipe)
+        ShoppingList.objects.create(user=user, recipe=recipe)
+
+
+def test_incremental_run_counts_new_events(recipes, authors):
+    recipe = recipes[0]
+    update_rankings('--full')
+    add_events(recipe, authors[:3])
+
+    ranking = update_rankings()[recipe.id]
+
+    assert ranking.popular == 6
+    assert 5.9 < ranking.trending <= 6
+
+
+def test_incremental_run_recounts_deleted_events(recipes, authors):
+    recipe = recipes[0]
+    add_events(recipe, authors[:3])
+    update_rankings('--full')
+
+    Favorite.objects.filter(recipe=recipe, user=authors[0]).delete()
+    ShoppingList.objects.get(recipe=recipe, user=authors[1]).delete()
+    ranking = update_rankings()[recipe.id]
+
+    assert ranking.popular == 4
+    assert 3.9 < ranking.trending <= 4
+    assert ranking.updated_at is not None
+
+
+def test_incremental_run_recounts_purged_users(recipes, authors):
+    recipe = recipes[0]
+    add_events(recipe, authors[:3])
+    update_rankings('--full')
+
+    mark_users_deleted(User.objects.filter(id=authors[2].id))
+    process_deletions(100, lambda model, count: None)
+    ranking = update_rankings()[recipe.id]
+
+    assert ranking.popular == 4
+
+
+def test_old_events_count_only_as_popular(recipes, authors):
+    recipe = recipes[0]
+    add_events(recipe, authors[:2])
+    Favorite.objects.update(
+        added_date=timezone.now() - timedelta(days=365)
+    )
+
+    ranking = update_rankings('--full')[recipe.id]
+
+    assert ranking.popular == 4
+    assert 1.9 < ranking.trending <= 2
+
+
+@pytest.mark.parametrize('ordering', ['popular', 'trending'])
+def test_ordering_keeps_recipes_without_ranking(
+    client, recipes, authors, ordering
+):
+    add_events(recipes[1], authors[:2])
+    update_rankings('--full')
+    RecipeRanking.objects.filter(recipe=recipes[0]).delete()
+
+    response = client.get(
+        '/api/recipes/', {'ordering': ordering, 'limit': len(recipes)}
+    )
+
+    ids = [item['id'] for item in response.json()['results']]
+    assert len(ids) == len(recipes)
+    assert ids[0] == recipes[1].id
+    assert ids[-1] == recipes[0].id
+
+
+def test_missing_rankings_are_backfilled(recipes):
+    RecipeRanking.objects.filter(recipe__in=recipes[:2]).delete()
+    migration = import_module(
+        'recipes.migrations.0011_backfill_recipe_rankings'
+    )
+
+    migration.create_missing_rankings(apps, None)
+
+    assert RecipeRanking.objects.count() == len(recipes)
+    assert RecipeRanking.objects.filter(
+        recipe__in=recipes[:2], updated_at__isnull=True
+    ).count() == 2
@@ -0,0 +1,154 @@
+from rest_framework.test import APIClient
+
+import pytest
+
+from api import cache as recipe_cache
+from api.serializers import RecipeListDetailSerializer
+from recipes.models import Follow, Ingredient, Recipe, Tag
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(settings):
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'default',
+        },
+        'recipes': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'recipes',
+        },
+    }
+    recipe_cache.cache.clear()
+    yield
+    recipe_cache.cache.clear()
+
+
+@pytest.fixture
+def built(monkeypatch):
+    """id рецептов, фрагменты которых собраны заново, а не взяты из кеша."""
+    built = []
+    build_fragments = RecipeListDetailSerializer.build_fragments
+
+    def record(recipes):
+        built.extend(recipe.id for recipe in recipes)
+        return build_fragments(recipes)
+
+    monkeypatch.setattr(
+        RecipeListDetailSerializer, 'build_fragments', staticmethod(record)
+    )
+    return built
+
+
+@pytest.fixture
+def recipe(recipes):
+    return recipes[0]
+
+
+def get_recipe(client, recipe):
+    response = client.get(f'/api/recipes/{recipe.id}/')
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_fragments_are_cached(user_client, recipes, built):
+    first = user_client.get('/api/recipes/').json()
+    assert len(built) == 10
+
+    second = user_client.get('/api/recipes/').json()
+
+    assert len(built) == 10
+    assert second == first
+
+
+def test_user_flags_are_not_cached(
+    user_client, user, recipe, built, django_capture_on_commit_callbacks
+):
+    anonymous = get_recipe(APIClient(), recipe)
+    with django_capture_on_commit_callbacks(execute=True):
+        user.favorites.create(recipe=recipe)
+        user.shoppinglist.create(recipe=recipe)
+        Follow.objects.create(user=user, following=recipe.author)
+
+    data = get_recipe(user_client, recipe)
+
+    assert built == [recipe.id]
+    assert data['is_favorited'] and data['is_in_shopping_cart']
+    assert data['author']['is_subscribed']
+    assert not anonymous['is_favorited']
+    assert not anonymous['is_in_shopping_cart']
+    assert not anonymous['author']['is_subscribed']
+    assert get_recipe(APIClient(), recipe) == anonymous
+
+
+def rename_recipe(recipe):
+    recipe = Recipe.objects.get(id=recipe.id)
+    recipe.name = 'Омлет'
+    recipe.save()
+    return lambda data: data['name'] == 'Омлет'
+
+
+def rename_tag(recipe):
+    tag = Tag.objects.get(slug='breakfast')
+    tag.name = 'Утро'
+    tag.save()
+    return lambda data: data['tags'][0]['name'] == 'Утро'
+
+
+def rename_ingredient(recipe):
+    ingredient = Ingredient.objects.get(name='Яйцо')
+    ingredient.name = 'Яйцо куриное'
+    ingredient.save()
+    return lambda data: data['ingredients'][0]['name'] == 'Яйцо куриное'
+
+
+@pytest.mark.parametrize('write', [
+    rename_recipe, rename_tag, rename_ingredient
+])
+def test_catalog_writes_invalidate_fragments(
+    user_client, recipe, built, write, django_capture_on_commit_callbacks
+):
+    get_recipe(user_client, recipe)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        check = write(recipe)
+
+    assert check(get_recipe(user_client, recipe))
+    assert built == [recipe.id, recipe.id]
+
+
+@pytest.mark.parametrize('action, flag', [
+    ('favorite', 'is_favorited'),
+    ('shopping_cart', 'is_in_shopping_cart'),
+])
+def test_membership_writes_update_flags(
+    user_client, recipe, action, flag, django_capture_on_commit_callbacks
+):
+    url = f'/api/recipes/{recipe.id}/{action}/'
+    assert not get_recipe(user_client, recipe)[flag]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert user_client.post(url).status_code == 201
+    assert get_recipe(user_client, recipe)[flag]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert user_client.delete(url).status_code == 204
+    assert not get_recipe(user_client, recipe)[flag]
+
+
+@pytest.mark.parametrize('param, related', [
+    ('is_favorited', 'favorites'),
+    ('is_in_shopping_cart', 'shoppinglist'),
+])
+def test_user_recipes_filter(user_client, user, recipes, param, related):
+    chosen = {recipes[0].id, recipes[4].id}
+    for recipe_id in chosen:
+        getattr(user, related).create(recipe_id=recipe_id)
+
+    response = user_client.get('/api/recipes/', {param: 1})
+
+    results = response.json()['results']
+    assert {item['id'] for item in results} == chosen
+    assert all(item[param] for item in results)
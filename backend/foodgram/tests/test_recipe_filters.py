@@ -0,0 +1,60 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+
+from recipes.models import Favorite, Tag
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def lunch(recipes):
+    tag = Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+    for recipe in recipes[::2]:
+        recipe.tags.add(tag)
+    return tag
+
+
+def get_ids(client, params):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get('/api/recipes/', {'limit': 100, **params})
+    assert response.status_code == 200
+    data = response.json()
+    ids = [item['id'] for item in data['results']]
+    assert data['count'] == len(ids)
+    assert not any('DISTINCT' in query['sql'] for query in queries)
+    return ids
+
+
+def test_several_tags_do_not_duplicate_recipes(client, recipes, lunch):
+    ids = get_ids(client, {'tags': ['breakfast', 'lunch']})
+
+    assert sorted(ids) == sorted(recipe.id for recipe in recipes)
+
+
+def test_tags_with_author_and_favorites(
+    user_client, user, recipes, authors, lunch
+):
+    author_recipes = [
+        recipe for recipe in recipes if recipe.author == authors[0]
+    ]
+    for recipe in author_recipes[:2]:
+        Favorite.objects.create(user=user, recipe=recipe)
+
+    ids = get_ids(user_client, {
+        'tags': ['lunch', 'breakfast'], 'author': authors[0].id,
+        'is_favorited': 1,
+    })
+    assert sorted(ids) == sorted(recipe.id for recipe in author_recipes[:2])
+
+    ids = get_ids(user_client, {'tags': 'lunch', 'author': authors[0].id})
+    assert sorted(ids) == sorted(
+        recipe.id for recipe in author_recipes if lunch in recipe.tags.all()
+    )
+
+
+def test_unknown_tag_is_rejected(client, recipes):
+    response = client.get('/api/recipes/', {'tags': 'dinner'})
+
+    assert response.status_code == 400
@@ -0,0 +1,75 @@
+import datetime
+import decimal
+import json
+import uuid
+
+from django.utils.translation import gettext_lazy
+
+import msgpack
+import pytest
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import MessagePackRenderer, ORJSONRenderer
+from recipes.models import Tag
+
+
+class AmountSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(
+        max_digits=6, decimal_places=2, coerce_to_string=False
+    )
+    created = serializers.DateTimeField()
+
+
+class OrderSerializer(serializers.Serializer):
+    title = serializers.CharField()
+    items = AmountSerializer(many=True)
+
+
+MOMENT = datetime.datetime(
+    2026, 10, 19, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc
+)
+DATA = [
+    {'price': decimal.Decimal('1.50')},
+    {'moment': MOMENT, 'date': MOMENT.date(), 'time': MOMENT.time()},
+    {'delta': datetime.timedelta(minutes=90)},
+    {'id': uuid.UUID('12345678-1234-5678-1234-567812345678')},
+    {'message': gettext_lazy('Это поле обязательно.')},
+    {'text': 'Строки\u2028и\u2029абзацы'},
+    OrderSerializer({
+        'title': 'Заказ',
+        'items': [
+            {'amount': decimal.Decimal('2.25'), 'created': MOMENT},
+            {'amount': decimal.Decimal('10'), 'created': MOMENT},
+        ],
+    }).data,
+]
+
+
+@pytest.mark.parametrize('data', DATA)
+def test_orjson_matches_json_renderer(data):
+    assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+@pytest.mark.parametrize('data', DATA)
+def test_msgpack_matches_json_renderer(data):
+    assert msgpack.unpackb(MessagePackRenderer().render(data)) == (
+        json.loads(JSONRenderer().render(data))
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params, headers', [
+    ({}, {'HTTP_ACCEPT': 'application/msgpack'}),
+    ({'format': 'msgpack'}, {}),
+])
+def test_msgpack_is_negotiated(client, params, headers):
+    Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+
+    response = client.get('/api/tags/', params, **headers)
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/msgpack'
+    assert msgpack.unpackb(response.content) == (
+        client.get('/api/tags/').json()
+    )
@@ -0,0 +1,88 @@
+import asyncio
+import csv
+import io
+import json
+
+from django.core.cache import cache
+
+import pytest
+
+from recipes.models import Ingredient, RecipeIngredient, ShoppingList
+
+from .test_asgi import request
+
+URL = '/api/recipes/download_shopping_cart/'
+FORMATS = ['csv', 'txt', 'json']
+
+
+@pytest.fixture(autouse=True)
+def clear_throttle():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def shopping_list(user, recipes):
+    salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+    RecipeIngredient.objects.create(
+        recipe=recipes[0], ingredient=salt, amount=5
+    )
+    for recipe in recipes[:2]:
+        ShoppingList.objects.create(user=user, recipe=recipe)
+    return [
+        {'name': 'Соль', 'measurement_unit': 'г', 'total': 5},
+        {'name': 'Яйцо', 'measurement_unit': 'шт', 'total': 4},
+    ]
+
+
+def parse(file_format, content):
+    text = content.decode()
+    if file_format == 'csv':
+        header, *rows = csv.reader(io.StringIO(text))
+        assert header == ['Ингредиент', 'Единица измерения', 'Количество']
+        return [
+            {'name': name, 'measurement_unit': unit, 'total': int(total)}
+            for name, unit, total in rows
+        ]
+    if file_format == 'txt':
+        return text.splitlines()
+    return json.loads(text)
+
+
+def expected(file_format, items):
+    if file_format == 'txt':
+        return ['Список покупок:'] + [
+            f'{item["name"]} ({item["measurement_unit"]}) - {item["total"]}'
+            for item in items
+        ]
+    return items
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('file_format', FORMATS)
+def test_download_with_test_client(user_client, shopping_list, file_format):
+    response = user_client.get(URL, {'format': file_format})
+
+    assert response.status_code == 200
+    assert response['Content-Disposition'] == (
+        f'attachment; filename="shopping_cart.{file_format}"'
+    )
+    content = b''.join(response.streaming_content)
+    assert parse(file_format, content) == expected(file_format, shopping_list)
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+@pytest.mark.parametrize('file_format', FORMATS)
+def test_download_through_asgi(user_client, shopping_list, file_format):
+    authorization = user_client._credentials['HTTP_AUTHORIZATION']
+
+    messages = asyncio.run(request(
+        URL, f'format={file_format}'.encode(),
+        [(b'authorization', authorization.encode())]
+    ))
+
+    assert messages[0]['status'] == 200
+    assert not messages[-1].get('more_body')
+    content = b''.join(message.get('body', b'') for message in messages[1:])
+    assert parse(file_format, content) == expected(file_format, shopping_list)
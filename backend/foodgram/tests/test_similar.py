@@ -0,0 +1,114 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from recipes.management.commands.buildsimilar import (
+    drop_common_columns,
+    split_by_pairs
+)
+from recipes.deletion import mark_recipes_deleted
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    SimilarRecipeQueue
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def build_similar(*args):
+    stdout = StringIO()
+    call_command('buildsimilar', *args, stdout=stdout)
+    return stdout.getvalue()
+
+
+def similar_ids(recipe):
+    return set(recipe.similar.values_list('similar_recipe_id', flat=True))
+
+
+def create_recipe(author, name, ingredients):
+    recipe = Recipe.objects.create(
+        author=author, name=name, image='recipes_images/test.png',
+        text='Описание', cooking_time=10
+    )
+    recipe.ingredients.add(*ingredients, through_defaults={'amount': 1})
+    return recipe
+
+
+def test_incremental_run_refreshes_recipes_with_shared_ingredients(user):
+    flour, milk, sugar, salt = (
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in ('Мука', 'Молоко', 'Сахар', 'Соль')
+    )
+    pancakes = create_recipe(user, 'Блины', [flour, milk])
+    waffles = create_recipe(user, 'Вафли', [flour, sugar])
+    soup = create_recipe(user, 'Суп', [salt])
+    build_similar('--full')
+    assert similar_ids(pancakes) == {waffles.id}
+
+    fritters = create_recipe(user, 'Оладьи', [flour, milk, sugar])
+    build_similar()
+
+    assert similar_ids(fritters) == {pancakes.id, waffles.id}
+    assert similar_ids(pancakes) == {waffles.id, fritters.id}
+    assert similar_ids(soup) == set()
+
+
+def test_recipe_without_neighbours_is_not_refreshed_again(user):
+    salt, sugar = (
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in ('Соль', 'Сахар')
+    )
+    create_recipe(user, 'Суп', [salt])
+    create_recipe(user, 'Компот', [sugar])
+
+    assert 'Обработано рецептов: 2 из 2' in build_similar()
+    assert not SimilarRecipeQueue.objects.exists()
+    assert 'Обработано рецептов' not in build_similar()
+
+
+@pytest.mark.parametrize('full', [True, False])
+def test_deleted_recipes_are_skipped(user, full):
+    flour, milk, sugar = (
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in ('Мука', 'Молоко', 'Сахар')
+    )
+    pancakes = create_recipe(user, 'Блины', [flour, milk])
+    waffles = create_recipe(user, 'Вафли', [flour, sugar])
+    deleted = create_recipe(user, 'Торт', [flour, milk, sugar])
+    deleted.tags.create(name='Десерт', color='#FFFFFF', slug='dessert')
+    mark_recipes_deleted(Recipe.objects.filter(id=deleted.id))
+
+    build_similar(*(['--full'] if full else []))
+
+    assert similar_ids(pancakes) == {waffles.id}
+    assert similar_ids(waffles) == {pancakes.id}
+
+
+def test_common_ingredients_are_dropped():
+    rows = np.repeat(np.arange(300), 2)
+    cols = np.tile([0, 1], 300)
+    cols[1::2] = np.arange(300) % 3 + 1
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)), shape=(300, 4)
+    )
+
+    filtered, frequency = drop_common_columns(matrix, 0.2)
+
+    assert filtered.shape == (300, 3)
+    assert frequency.tolist() == [100, 100, 100]
+
+
+def test_batches_are_capped_by_pairs():
+    index = np.arange(6)
+    costs = np.array([5, 5, 5, 20, 1, 1])
+
+    batches = list(split_by_pairs(index, costs, 4, 10))
+
+    assert [batch.tolist() for batch in batches] == [
+        [0, 1], [2], [3], [4, 5]
+    ]
@@ -0,0 +1,57 @@
+import pytest
+
+from recipes.models import Follow
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def subscriptions(user, authors, recipes):
+    Follow.objects.bulk_create(
+        Follow(user=user, following=author) for author in authors[:3]
+    )
+
+
+@pytest.mark.parametrize('params, fields', [
+    ({'fields': 'id,name'}, {'id', 'name'}),
+    ({'fields': 'id, author'}, {'id', 'author'}),
+    (
+        {'omit': 'text,ingredients,tags'},
+        {
+            'id', 'author', 'is_favorited', 'is_in_shopping_cart', 'name',
+            'image', 'cooking_time'
+        }
+    ),
+    ({'fields': 'id,name,text', 'omit': 'text'}, {'id', 'name'}),
+])
+def test_fields_are_selected(user_client, recipes, params, fields):
+    response = user_client.get('/api/recipes/', params)
+
+    assert response.status_code == 200
+    assert all(set(item) == fields for item in response.json()['results'])
+
+
+def test_detail_fields_are_selected(user_client, recipes):
+    response = user_client.get(
+        f'/api/recipes/{recipes[0].id}/', {'fields': 'id,cooking_time'}
+    )
+
+    assert response.json() == {'id': recipes[0].id, 'cooking_time': 10}
+
+
+def test_author_subscription_is_read_once(
+    user_client, authors, subscriptions, query_budget
+):
+    with query_budget(8, threshold=2):
+        response = user_client.get(
+            '/api/recipes/', {'fields': 'id,author', 'limit': 21}
+        )
+
+    assert response.status_code == 200
+    subscribed = {
+        item['author']['username']: item['author']['is_subscribed']
+        for item in response.json()['results']
+    }
+    assert subscribed == {
+        author.username: index < 3 for index, author in enumerate(authors)
+    }
@@ -0,0 +1,102 @@
+from django.core.cache import cache
+
+import pytest
+from rest_framework.views import APIView
+
+from api.throttling import ActionRateThrottle
+
+pytestmark = pytest.mark.django_db
+
+RATES = {'create': '3/minute', 'favorite': '5/minute'}
+
+
+class View(APIView):
+    throttle_scopes = {'create': 'create', 'favorite': 'favorite'}
+
+    def __init__(self, action):
+        super().__init__()
+        self.action = action
+
+
+@pytest.fixture(autouse=True)
+def rates(monkeypatch):
+    monkeypatch.setattr(ActionRateThrottle, 'THROTTLE_RATES', RATES)
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = {'now': 6030.0}
+    monkeypatch.setattr(ActionRateThrottle, 'timer', lambda self: clock['now'])
+    return clock
+
+
+@pytest.fixture
+def attempt(rf, user):
+    def attempt(action):
+        request = rf.post('/')
+        request.user = user
+        throttle = ActionRateThrottle()
+        return throttle.allow_request(request, View(action)), throttle
+    return attempt
+
+
+def test_limit_ignores_rejected_requests(attempt, clock):
+    assert [attempt('create')[0] for _ in range(3)] == [True] * 3
+    for _ in range(20):
+        allowed, throttle = attempt('create')
+        assert not allowed
+        assert throttle.wait() == pytest.approx(50)
+
+    clock['now'] += 51
+    assert attempt('create')[0]
+
+
+def test_wait_in_second_window(attempt, clock):
+    for _ in range(3):
+        attempt('create')
+    clock['now'] += 35
+
+    allowed, throttle = attempt('create')
+    assert not allowed
+    assert throttle.wait() == pytest.approx(15)
+    clock['now'] += 16
+    assert attempt('create')[0]
+
+
+def test_wait_does_not_exceed_window(attempt, clock):
+    clock['now'] = 6005.0
+    for _ in range(3):
+        attempt('create')
+
+    allowed, throttle = attempt('create')
+    assert not allowed
+    assert throttle.wait() == throttle.duration
+    clock['now'] += throttle.duration
+
+    allowed, throttle = attempt('create')
+    assert not allowed
+    assert throttle.wait() <= throttle.duration / throttle.num_requests
+
+
+def test_actions_have_separate_scopes(attempt, clock):
+    for _ in range(3):
+        attempt('create')
+
+    assert not attempt('create')[0]
+    assert [attempt('favorite')[0] for _ in range(6)] == [True] * 5 + [False]
+    assert all(attempt('list')[0] for _ in range(10))
+
+
+def test_retry_after_header(user_client, monkeypatch):
+    monkeypatch.setitem(RATES, 'download_shopping_cart', '2/minute')
+    url = '/api/recipes/download_shopping_cart/'
+
+    statuses = [user_client.get(url).status_code for _ in range(3)]
+    response = user_client.get(url)
+
+    assert statuses == [400, 400, 429]
+    assert response.status_code == 429
+    assert 0 < int(response['Retry-After']) <= 60
@@ -1,11 +1,20 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from recipes.deletion import mark_users_deleted
+
 from .models import User
 
 
 class CustomUserAdmin(UserAdmin):
-    list_filter = ('email', 'username')
+    search_fields = ('email', 'username')
+    show_full_result_count = False
+    list_filter = ('is_deleted',)
+    actions = ('mark_deleted',)
+
+    @admin.action(description='Удалить в фоне')
+    def mark_deleted(self, request, queryset):
+        mark_users_deleted(queryset)
 
 
 admin.site.register(User, CustomUserAdmin)
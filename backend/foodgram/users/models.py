@@ -12,6 +12,7 @@ class User(AbstractUser):
     )
     first_name = models.CharField('first name', max_length=150)
     last_name = models.CharField('last name', max_length=150)
+    is_deleted = models.BooleanField('deleted', default=False)
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
@@ -0,0 +1,298 @@
+"""
+Нагрузочный тест API на основе запросов из postman-коллекции.
+
+Каждый виртуальный пользователь регистрируется, получает токен, создаёт
+рецепт, а затем до окончания теста листает рецепты, открывает карточку,
+добавляет рецепт в избранное и список покупок и скачивает список покупок.
+По окончании выводится пропускная способность, перцентили задержки и
+доля ошибок по каждому запросу.
+
+Пример запуска против локального сервера:
+
+    python loadtest.py --base-url http://127.0.0.1:8000 --users 50 \
+        --duration 60
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+import aiohttp
+
+COLLECTION_PATH = Path(__file__).with_name('diploma.postman_collection.json')
+VARIABLE_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+
+# Запросы коллекции, из которых состоит сценарий пользователя.
+SIGN_UP = 'create_first_user'
+LOG_IN = 'get_token_for_first_user'
+CREATE_RECIPE = 'create_fifth_recipe // User'
+BROWSE_STEPS = (
+    'get_recipes_list // User',
+    'get_recipe_detail // User',
+    'add_to_favorite // User',
+    'add_to_shopping_cart // User',
+    'download_shopping_cart // User',
+)
+
+
+def load_collection(path):
+    """Запросы коллекции по имени и переменные коллекции."""
+    collection = json.loads(path.read_text(encoding='utf-8'))
+    requests = {}
+
+    def walk(items):
+        for item in items:
+            if 'item' in item:
+                walk(item['item'])
+            else:
+                requests.setdefault(item['name'], item['request'])
+
+    walk(collection['item'])
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', [])
+    }
+    return requests, variables
+
+
+class MissingVariable(KeyError):
+    """В запросе есть переменная, значение которой ещё не известно."""
+
+
+def render(template, variables):
+    def substitute(match):
+        name = match.group(1)
+        if name not in variables:
+            raise MissingVariable(name)
+        return str(variables[name])
+
+    return VARIABLE_PATTERN.sub(substitute, template)
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.throttled = defaultdict(int)
+        self.skipped = defaultdict(int)
+        self.missing_variables = set()
+
+    def add(self, name, latency, status):
+        self.latencies[name].append(latency)
+        if status == 429:
+            self.throttled[name] += 1
+        elif status is None or status >= 400:
+            self.errors[name] += 1
+
+    def skip(self, name):
+        """Запрос не отправлен: считается ошибкой, но без задержки."""
+        self.skipped[name] += 1
+        self.errors[name] += 1
+
+    def report(self, elapsed):
+        header = (
+            f'{"запрос":<34}{"всего":>8}{"rps":>8}{"p50":>8}{"p90":>8}'
+            f'{"p95":>8}{"p99":>8}{"ошибки":>9}{"429":>6}'
+        )
+        print(header)
+        print('-' * len(header))
+        total = 0
+        for name in sorted(set(self.latencies) | set(self.skipped)):
+            latencies = sorted(self.latencies[name])
+            count = len(latencies) + self.skipped[name]
+            total += count
+            percentiles = ''.join(
+                f'{percentile(latencies, value) * 1000:>8.0f}'
+                if latencies else f'{"-":>8}'
+                for value in (50, 90, 95, 99)
+            )
+            print(
+                f'{name[:33]:<34}{count:>8}'
+                f'{count / elapsed:>8.1f}{percentiles}'
+                f'{self.errors[name] / count:>9.1%}'
+                f'{self.throttled[name]:>6}'
+            )
+        print('-' * len(header))
+        print(
+            f'Всего запросов: {total} за {elapsed:.1f} с, '
+            f'{total / elapsed:.1f} запросов в секунду. '
+            f'Задержки указаны в миллисекундах.'
+        )
+
+
+def percentile(values, value):
+    index = min(len(values) - 1, int(round(value / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class VirtualUser:
+    def __init__(self, session, requests, variables, stats):
+        self.session = session
+        self.requests = requests
+        self.stats = stats
+        self.variables = dict(variables)
+        suffix = uuid.uuid4().hex[:12]
+        self.variables.update(
+            email=json.dumps(f'load-{suffix}@example.com'),
+            username=json.dumps(f'load-{suffix}'),
+        )
+
+    async def send(self, name):
+        try:
+            return await self.perform(name)
+        except MissingVariable as error:
+            # Например, firstRecipeId, пока список рецептов не вернул ни
+            # одного рецепта: шаг пропускается и считается ошибкой.
+            self.stats.skip(name)
+            self.stats.missing_variables.add(error.args[0])
+            return None, None
+
+    async def perform(self, name):
+        request = self.requests[name]
+        url = render(request['url']['raw'], self.variables)
+        headers = {
+            header['key']: render(header['value'], self.variables)
+            for header in request.get('header', [])
+        }
+        auth = request.get('auth') or {}
+        if auth.get('type') == 'apikey':
+            apikey = {item['key']: item['value'] for item in auth['apikey']}
+            headers[apikey['key']] = render(apikey['value'], self.variables)
+
+        body = request.get('body', {}).get('raw')
+        if body is not None:
+            body = render(body, self.variables).encode()
+            headers['Content-Type'] = 'application/json'
+
+        started = time.perf_counter()
+        status = None
+        data = None
+        try:
+            async with self.session.request(
+                request['method'], url, data=body, headers=headers
+            ) as response:
+                status = response.status
+                payload = await response.read()
+                if response.content_type == 'application/json' and payload:
+                    data = json.loads(payload)
+        except aiohttp.ClientError:
+            pass
+        self.stats.add(name, time.perf_counter() - started, status)
+        return status, data
+
+    async def run(self, deadline, think_time):
+        await self.send(SIGN_UP)
+        status, data = await self.send(LOG_IN)
+        if status != 200:
+            return
+        self.variables['userToken'] = data['auth_token']
+        await self.send(CREATE_RECIPE)
+
+        while time.monotonic() < deadline:
+            for name in BROWSE_STEPS:
+                status, data = await self.send(name)
+                if name.startswith('get_recipes_list') and data:
+                    recipe_ids = [
+                        recipe['id'] for recipe in data.get('results', [])
+                    ]
+                    if recipe_ids:
+                        self.variables['firstRecipeId'] = random.choice(
+                            recipe_ids
+                        )
+                if think_time:
+                    await asyncio.sleep(random.uniform(0, think_time))
+                if time.monotonic() >= deadline:
+                    break
+
+
+async def load_catalog(session, base_url, variables):
+    """Id тегов и ингредиентов, которые подставляются в запросы."""
+    async with session.get(f'{base_url}/api/tags/') as response:
+        tags = await response.json()
+    async with session.get(f'{base_url}/api/ingredients/') as response:
+        ingredients = await response.json()
+    if len(tags) < 2 or len(ingredients) < 2:
+        raise SystemExit(
+            'Для теста в базе нужно как минимум 2 тега и 2 ингредиента.'
+        )
+    variables.update(
+        firstTagId=tags[0]['id'],
+        secondTagId=tags[1]['id'],
+        firstIndredientId=ingredients[0]['id'],
+        secondIndredientId=ingredients[1]['id'],
+    )
+
+
+async def main(options):
+    requests, variables = load_collection(COLLECTION_PATH)
+    base_url = options.base_url.rstrip('/')
+    variables['baseUrl'] = base_url
+    stats = Stats()
+
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=options.timeout)
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=timeout
+    ) as session:
+        await load_catalog(session, base_url, variables)
+        started = time.monotonic()
+        deadline = started + options.duration
+        tasks = []
+        for index in range(options.users):
+            user = VirtualUser(session, requests, variables, stats)
+            tasks.append(asyncio.create_task(
+                user.run(deadline, options.think_time)
+            ))
+            if options.ramp_up:
+                await asyncio.sleep(options.ramp_up / options.users)
+        # Упавший виртуальный пользователь не прерывает остальных.
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        elapsed = time.monotonic() - started
+
+    stats.report(elapsed)
+    if stats.missing_variables:
+        print(
+            'Пропущены запросы с неизвестными переменными: '
+            + ', '.join(sorted(stats.missing_variables))
+        )
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        print(
+            f'Пользователей завершилось с ошибкой: {len(failures)}, '
+            f'первая: {failures[0]!r}'
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument(
+        '--users', type=int, default=20,
+        help='Число одновременных виртуальных пользователей'
+    )
+    parser.add_argument(
+        '--duration', type=float, default=30,
+        help='Длительность теста в секундах'
+    )
+    parser.add_argument(
+        '--ramp-up', type=float, default=0,
+        help='За сколько секунд запустить всех пользователей'
+    )
+    parser.add_argument(
+        '--think-time', type=float, default=0,
+        help='Наибольшая пауза между запросами пользователя в секундах'
+    )
+    parser.add_argument(
+        '--timeout', type=float, default=30,
+        help='Таймаут одного запроса в секундах'
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))